@@ -0,0 +1,131 @@
+"""
+Индекс приближенного поиска ближайших соседей (IVF-Flat)
+Векторы разбиваются сферическим k-means на nlist списков, запрос сравнивается
+с центроидами и просматривает только nprobe ближайших списков. Векторы хранятся
+в порядке списков, поэтому каждый список читается одним непрерывным срезом
+"""
+import json
+import math
+import os
+
+import numpy as np
+
+INDEX_META = 'ivf.json'
+
+
+def _assign(vectors, centroids, block_size):
+    """Номер ближайшего (по косинусу) центроида для каждой строки, блоками"""
+    labels = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), block_size):
+        block = np.asarray(vectors[start:start + block_size], dtype=np.float32)
+        labels[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return labels
+
+
+def train_centroids(sample, k, iterations=10, seed=0):
+    """Сферический k-means на выборке, возвращает нормированные центроиды (k, d)"""
+    rng = np.random.default_rng(seed)
+    centroids = sample[rng.choice(len(sample), size=k, replace=False)].copy()
+    for _ in range(iterations):
+        labels = np.argmax(sample @ centroids.T, axis=1)
+        counts = np.bincount(labels, minlength=k)
+        # Суммы по кластерам одним reduceat по отсортированной выборке
+        order = np.argsort(labels, kind='stable')
+        nonempty = np.flatnonzero(counts)
+        starts = (np.cumsum(counts) - counts)[nonempty]
+        sums = np.zeros_like(centroids)
+        sums[nonempty] = np.add.reduceat(sample[order], starts, axis=0)
+        # Пустые кластеры переинициализируются случайными точками выборки
+        empty = counts == 0
+        if empty.any():
+            sums[empty] = sample[rng.choice(len(sample), size=int(empty.sum()))]
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        centroids = sums / np.maximum(norms, 1e-12)
+    return centroids.astype(np.float32)
+
+
+def build_ivf_index(vectors, path, nlist=None, sample_size=100000, iterations=10,
+                    block_size=65536, report=None, centroids=None):
+    """
+    Строит индекс по матрице vectors (допускается np.memmap) в каталоге path
+    nlist по умолчанию ~4*sqrt(N); с centroids (например, индекса прошлой
+    загрузки того же корпуса) обучение пропускается
+    """
+    count, dimension = vectors.shape
+    os.makedirs(path, exist_ok=True)
+    if centroids is not None:
+        nlist = len(centroids)
+    else:
+        if nlist is None:
+            nlist = int(4 * math.sqrt(count))
+        nlist = max(1, min(nlist, count))
+        rng = np.random.default_rng(0)
+        sample_ids = np.sort(rng.choice(count, size=min(count, max(sample_size, nlist)), replace=False))
+        centroids = train_centroids(np.asarray(vectors[sample_ids], dtype=np.float32), nlist, iterations)
+    if report:
+        report(30)
+
+    labels = _assign(vectors, centroids, block_size)
+    order = np.argsort(labels, kind='stable')
+    offsets = np.zeros(nlist + 1, dtype=np.int64)
+    np.cumsum(np.bincount(labels, minlength=nlist), out=offsets[1:])
+    if report:
+        report(60)
+
+    list_vectors = np.lib.format.open_memmap(
+        os.path.join(path, 'ivf_vectors.npy'), mode='w+', dtype=vectors.dtype, shape=(count, dimension))
+    for start in range(0, count, block_size):
+        ids = order[start:start + block_size]
+        # Строки читаются в порядке возрастания номеров, затем переставляются в порядок списков
+        perm = np.argsort(ids)
+        block = np.empty((len(ids), dimension), dtype=vectors.dtype)
+        block[perm] = vectors[ids[perm]]
+        list_vectors[start:start + len(ids)] = block
+    list_vectors.flush()
+    del list_vectors
+
+    np.save(os.path.join(path, 'ivf_centroids.npy'), centroids)
+    np.save(os.path.join(path, 'ivf_offsets.npy'), offsets)
+    np.save(os.path.join(path, 'ivf_ids.npy'), order.astype(np.int64))
+    with open(os.path.join(path, INDEX_META), 'w') as f:
+        json.dump({"nlist": nlist, "count": count, "dimension": dimension}, f)
+    if report:
+        report(100)
+
+
+class IVFIndex:
+    """Загруженный индекс; векторы списков отображаются в память"""
+
+    def __init__(self, path):
+        with open(os.path.join(path, INDEX_META)) as f:
+            meta = json.load(f)
+        self.nlist = meta['nlist']
+        self.count = meta['count']
+        self.dimension = meta['dimension']
+        self.centroids = np.load(os.path.join(path, 'ivf_centroids.npy'))
+        self.offsets = np.load(os.path.join(path, 'ivf_offsets.npy'))
+        self.ids = np.load(os.path.join(path, 'ivf_ids.npy'), mmap_mode='r')
+        self.vectors = np.load(os.path.join(path, 'ivf_vectors.npy'), mmap_mode='r')
+
+    def search(self, query, k, nprobe):
+        """Идентификаторы и косинусные оценки k ближайших векторов, по убыванию оценки"""
+        query = np.asarray(query, dtype=np.float32)
+        nprobe = max(1, min(nprobe, self.nlist))
+        probe = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+
+        ids, scores = [], []
+        for list_no in np.sort(probe):
+            start, end = self.offsets[list_no], self.offsets[list_no + 1]
+            if start == end:
+                continue
+            scores.append(self.vectors[start:end] @ query)
+            ids.append(self.ids[start:end])
+        if not scores:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        scores = np.concatenate(scores)
+        ids = np.concatenate(ids)
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return ids[top], scores[top]
@@ -1,16 +1,101 @@
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, request, jsonify, send_file, stream_with_context
 from mock_data import *
+from config import (
+    ANN_NPROBE,
+    CORPORA_PATH,
+    EMBEDDING_BATCH_MAX_BYTES,
+    EMBEDDING_CACHE_DISK_SIZE,
+    EMBEDDING_CACHE_PATH,
+    EMBEDDING_CACHE_SIZE,
+    EMBEDDING_BATCH_MAX_TEXTS,
+    EMBEDDING_COALESCE_MAX_BATCH,
+    EMBEDDING_COALESCE_MAX_WAIT_MS,
+    EMBEDDING_MICRO_BATCH_SIZE,
+    EVALUATION_CACHE_SIZE,
+    JOB_DB_PATH,
+    JOB_EVENTS_KEEPALIVE_SEC,
+    JOB_QUEUE_SIZE,
+    JOB_RESULTS_PATH,
+    JOB_STATUS_MAX_WAIT_SEC,
+    JOB_TYPE_LIMITS,
+    JOB_WORKERS,
+    MODEL_CACHE_MAX_BYTES,
+    RESULT_CACHE_MAX_AGE,
+    SEARCH_CACHE_SIZE,
+    TEXT_CHUNK_BYTES,
+    TEXT_MAX_BYTES,
+)
+from batcher import MicroBatcher
+from embedding_cache import EmbeddingCache
+from evaluation import EvaluationCache, evaluate_classification
+from events import JobEvents
+from models import ModelRegistry
+from search import SearcherCache
+import normalizer
+from jobs import JobEngine, QueueFullError
+from job_store import RESULT_ENCODINGS, JobStore
+import tasks
 import uuid
 import time
 import os
 import datetime
+import io
+import json
+import hashlib
+import numpy as np
 
 app = Flask(__name__)
 
-# База данных для хранения заданий
-jobs_db = {}
-# Время создания заданий
-job_creation_time = {}
+# Режим отладки с перезагрузчиком при запуске python app.py
+DEBUG = True
+
+# Службы бэкенда создает start(): процессы-обработчики заданий импортируют этот модуль
+# как __mp_main__ и не должны открывать базы данных и возобновлять задания
+job_store = job_engine = job_events = model_registry = None
+embedding_batcher = embedding_cache = searchers = evaluation_cache = None
+
+def register_fine_tuned_model(job_id, job_type, status):
+    if job_type != 'fine_tuning' or status != 'completed':
+        return
+    job = job_store.get(job_id)
+    if job is None:
+        return
+    if 'new_model_id' not in job:
+        result = job_store.get_result(job_id)
+        if result is None:
+            return
+        # Итог дообучения копируется в данные задания: история не читает файлы результатов
+        job = dict(job, new_model_id=result['new_model_id'], training_time=result.get('training_time'),
+                   model_name=result.get('model_name', result['new_model_id']))
+        job_store.update_data(job_id, new_model_id=job['new_model_id'], training_time=job['training_time'],
+                              model_name=job['model_name'])
+    base = model_registry.describe(job['base_model_id'])
+    model_registry.register({
+        "model_id": job['new_model_id'],
+        "model_name": job['model_name'],
+        "dimension": base['dimension'] if base else 512,
+        "base_model_id": job['base_model_id']
+    })
+
+def enqueue_job(job_type, task, job, params, estimated_time_min):
+    """Создает задание и ставит его в очередь движка"""
+    job_id = str(uuid.uuid4())
+    params = dict(params, job_id=job_id)
+    job_store.create(job_id, job_type, job,
+                     details={"bytes_processed": 0, "files_processed": 0},
+                     task=task.__name__, params=params)
+
+    try:
+        job_engine.submit(job_id, job_type, task, params)
+    except QueueFullError:
+        job_store.delete(job_id)
+        return jsonify(error="Too many requests"), 429
+    job_events.publish(job_id)
+
+    return jsonify({
+        "job_id": job_id,
+        "estimated_time_min": estimated_time_min
+    }), 202
 
 # Фиксированные mock-данные
 
@@ -27,52 +112,168 @@ def planetar_visualization():
 def drilldown_visualization():
     return VISUALIZATION_HTML["drilldown"], 200, {'Content-Type': 'text/html'}
 
+class PayloadTooLarge(Exception):
+    pass
+
+def request_chunks(max_bytes=None):
+    """
+    Тело запроса блоками по TEXT_CHUNK_BYTES байт без чтения целиком;
+    PayloadTooLarge, если прочитано больше max_bytes (тело без Content-Length)
+    """
+    size = 0
+    for chunk in iter(lambda: request.stream.read(TEXT_CHUNK_BYTES), b''):
+        size += len(chunk)
+        if max_bytes is not None and size > max_bytes:
+            raise PayloadTooLarge()
+        yield chunk
+
 # Основные API эндпоинты
 @app.route('/api/normalize', methods=['POST'])
 def normalize_text():
     if not request.content_type or 'text/plain' not in request.content_type:
         return jsonify(error="INVALID_ENCODING"), 400
     
-    if request.content_length and request.content_length > 10 * 1024 * 1024:
+    if request.content_length and request.content_length > TEXT_MAX_BYTES:
         return jsonify(error="PAYLOAD_TOO_LARGE"), 413
     
-    response_text = "Нормализованный текст пример"
+    # Текст нормализуется по мере чтения и отдается частями (chunked):
+    # в памяти только текущий блок и незавершенное на его границе слово.
+    # Тело без Content-Length читается до отправки статуса (не больше
+    # TEXT_MAX_BYTES), чтобы превышение лимита было ответом 413, а не
+    # оборванным на середине ответом 200
+    chunks = request_chunks(TEXT_MAX_BYTES)
+    if request.content_length is None:
+        try:
+            chunks = list(chunks)
+        except PayloadTooLarge:
+            return jsonify(error="PAYLOAD_TOO_LARGE"), 413
+    
+    def generate():
+        for text in normalizer.iter_normalized(normalizer.decode_chunks(chunks)):
+            yield text.encode('utf-8')
+    
     response = app.response_class(
-        response=response_text,
+        response=stream_with_context(generate()),
         status=200,
         mimetype='text/plain'
     )
     response.headers['language'] = 'ru'
     return response
 
+@app.route('/api/normalize/cache', methods=['GET'])
+def normalize_cache_info():
+    # Счетчики кэша нормальных форм процесса сервера (нормализация и поисковые запросы)
+    return jsonify(normalizer.cache_info())
+
+@app.route('/api/embedding/cache', methods=['GET'])
+def embedding_cache_info():
+    # Счетчики кэша эмбеддингов поисковых запросов в процессе сервера
+    return jsonify(embedding_cache.info())
+
+def read_embedding_texts():
+    """
+    Тексты запроса эмбеддингов: text/plain - один текст,
+    JSON-массив строк или NDJSON (по строке JSON на текст) - пакет
+    Возвращает (тексты, признак пакета, ответ с ошибкой или None)
+    """
+    content_type = request.content_type or ''
+    if 'text/plain' in content_type:
+        if request.content_length and request.content_length > TEXT_MAX_BYTES:
+            return None, False, (jsonify(error="PAYLOAD_TOO_LARGE"), 413)
+        try:
+            text = ''.join(normalizer.decode_chunks(request_chunks(TEXT_MAX_BYTES)))
+        except PayloadTooLarge:
+            return None, False, (jsonify(error="PAYLOAD_TOO_LARGE"), 413)
+        return [text], False, None
+    
+    if 'application/json' not in content_type and 'application/x-ndjson' not in content_type:
+        return None, False, (jsonify(error="INVALID_ENCODING"), 400)
+    
+    if request.content_length and request.content_length > EMBEDDING_BATCH_MAX_BYTES:
+        return None, False, (jsonify(error="PAYLOAD_TOO_LARGE"), 413)
+    
+    try:
+        if 'application/x-ndjson' in content_type:
+            texts = [json.loads(line) for line in request.get_data(as_text=True).splitlines() if line.strip()]
+        else:
+            texts = json.loads(request.get_data(as_text=True))
+    except ValueError:
+        return None, False, (jsonify(error="Invalid JSON"), 400)
+    
+    if not isinstance(texts, list) or not all(isinstance(text, str) for text in texts):
+        return None, False, (jsonify(error="Expected an array of strings"), 400)
+    
+    if len(texts) > EMBEDDING_BATCH_MAX_TEXTS:
+        return None, False, (jsonify(error="Too many texts in batch"), 413)
+    
+    return texts, True, None
+
+def infer_embeddings(model_id, texts):
+    return model_registry.get(model_id).embed(texts, EMBEDDING_MICRO_BATCH_SIZE)
+
+# Форматы ответа эмбеддингов, JSON по умолчанию
+EMBEDDING_MIMETYPES = ['application/json', 'application/octet-stream', 'application/x-npy']
+EMBEDDING_DTYPES = {'float32': '<f4', 'float16': '<f2'}
+
+def binary_embedding_response(vectors, mimetype):
+    """
+    Векторы в бинарном виде: сырая little-endian матрица (application/octet-stream)
+    или .npy файл (application/x-npy); тип задается заголовком x-embedding-dtype
+    """
+    dtype = request.headers.get('x-embedding-dtype', 'float32')
+    if dtype not in EMBEDDING_DTYPES:
+        return jsonify(error="Unsupported dtype"), 400
+    
+    matrix = vectors.astype(EMBEDDING_DTYPES[dtype], copy=False)
+    if mimetype == 'application/x-npy':
+        buffer = io.BytesIO()
+        np.lib.format.write_array(buffer, matrix, allow_pickle=False)
+        body = buffer.getvalue()
+    else:
+        body = matrix.tobytes()
+    
+    response = app.response_class(response=body, status=200, mimetype=mimetype)
+    response.headers['x-embedding-dtype'] = dtype
+    response.headers['x-embedding-dimension'] = str(matrix.shape[1])
+    response.headers['x-embedding-count'] = str(matrix.shape[0])
+    return response
+
 @app.route('/api/embedding', methods=['POST'])
 def get_embedding():
-    if not request.content_type or 'text/plain' not in request.content_type:
-        return jsonify(error="INVALID_ENCODING"), 400
-    
-    if request.content_length and request.content_length > 10 * 1024 * 1024:
-        return jsonify(error="PAYLOAD_TOO_LARGE"), 413
+    texts, batch, error = read_embedding_texts()
+    if error:
+        return error
     
     model_id = request.headers.get('x-model-id')
     if not model_id:
         return jsonify(error="Model ID required"), 400
     
-    model_exists = any(m['model_id'] == model_id for m in MOCK_MODELS)
-    if not model_exists:
+    if not model_registry.describe(model_id):
         return jsonify(error="Model not found"), 404
     
-    dimension = next((m['dimension'] for m in MOCK_MODELS if m['model_id'] == model_id), 512)
-    embeddings = MOCK_EMBEDDINGS[:dimension] if dimension <= len(MOCK_EMBEDDINGS) else MOCK_EMBEDDINGS * (dimension // len(MOCK_EMBEDDINGS) + 1)
-    embeddings = embeddings[:dimension]
+    # Тексты нормализуются так же, как абзацы корпуса и поисковые запросы,
+    # иначе векторы не сравнимы с векторами корпуса
+    vectors = embedding_batcher.embed(model_id, [normalizer.normalize_text(text) for text in texts])
+    
+    mimetype = request.accept_mimetypes.best_match(EMBEDDING_MIMETYPES, default='application/json')
+    if mimetype != 'application/json':
+        return binary_embedding_response(vectors, mimetype)
+    
+    if batch:
+        return jsonify({
+            "embeddings": vectors.tolist(),
+            "dimension": vectors.shape[1],
+            "count": len(texts)
+        })
     
     return jsonify({
-        "embeddings": embeddings,
-        "dimension": dimension
+        "embeddings": vectors[0].tolist(),
+        "dimension": vectors.shape[1]
     })
 
 @app.route('/api/models', methods=['GET'])
 def get_models():
-    return jsonify(MOCK_MODELS)
+    return jsonify(model_registry.list())
 
 @app.route('/api/semantic/upload', methods=['POST'])
 def upload_corpus():
@@ -85,11 +286,13 @@ def upload_corpus():
     if not corpus_path or not model_id:
         return jsonify(error="Missing required headers"), 400
     
-    model_exists = any(m['model_id'] == model_id for m in MOCK_MODELS)
-    if not model_exists:
+    if not model_registry.describe(model_id):
         return jsonify(error="Model not found"), 404
     
-    job_id = str(uuid.uuid4())
+    root = tasks.resolve_corpus_path(corpus_path)
+    if root is None or not os.path.isdir(root):
+        return jsonify(error="Corpus path not found"), 404
+    
     # Generate a corpus_id that is different from corpus_path
     corpus_id = str(uuid.uuid4())
     
@@ -98,72 +301,149 @@ def upload_corpus():
     # Это имитирует реальное поведение бэкенда, который меняет путь
     backend_corpus_path = f"/backend{corpus_path}"
     
-    # Create upload result with the generated corpus_id and modified corpus_path
-    upload_result = {
-        "corpus_id": corpus_id,
-        "corpus_path": backend_corpus_path,
-        "file_count": 30000,
-        "index_stats": {
-            "total_size_gb": 95.4
-        }
-    }
-    
-    jobs_db[job_id] = {
-        'status': 'processing',
-        'type': 'upload',
-        'progress': 0,
+    job = {
         'corpus_path': corpus_path,  # Оригинальный путь
         'backend_corpus_path': backend_corpus_path,  # Новый путь от бэкенда
-        'model_id': model_id,
-        'result': upload_result
+        'model_id': model_id
     }
-    job_creation_time[job_id] = time.time()
+    params = dict(job, corpus_id=corpus_id, model=model_registry.describe(model_id))
+    return enqueue_job('upload', tasks.run_upload, job, params, 120)
+
+def job_status(job):
+    """Состояние задания в формате API"""
+    if job['status'] == 'completed':
+        return {
+            "status": "completed",
+            "result_url": f"/api/jobs/{job['job_id']}/result"
+        }
     
-    return jsonify({
-        "job_id": job_id,
-        "estimated_time_min": 120
-    }), 202
+    if job['status'] == 'failed':
+        return {
+            "status": "failed",
+            "error": job.get('error')
+        }
+    
+    # Задания в очереди для клиента выглядят как обрабатываемые с нулевым прогрессом
+    return {
+        "status": "processing",
+        "progress": job['progress'],
+        "details": job['details']
+    }
 
 @app.route('/api/jobs/<job_id>', methods=['GET'])
 def get_job_status(job_id):
-    job = jobs_db.get(job_id)
-    if not job:
-        return jsonify(error="Job not found"), 404
-    
-    current_time = time.time()
-    job_start_time = job_creation_time.get(job_id, current_time)
-    elapsed_time = current_time - job_start_time
+    """
+    Состояние задания; с ?wait=<сек.> незавершенное задание отвечает
+    после ближайшего изменения или по истечении ожидания (long-poll)
+    """
+    try:
+        wait = min(float(request.args.get('wait', 0)), JOB_STATUS_MAX_WAIT_SEC)
+    except ValueError:
+        return jsonify(error="Invalid wait"), 400
     
-    if elapsed_time < 3:
-        progress = min(int((elapsed_time / 3) * 100), 100)
-        return jsonify({
-            "status": "processing",
-            "progress": progress,
-            "details": {
-                "bytes_processed": progress * 1000000,
-                "files_processed": progress * 50
-            }
-        })
-    else:
-        jobs_db[job_id]['status'] = 'completed'
-        
+    subscription = job_events.subscribe(job_id) if wait > 0 else None
+    try:
+        job = job_store.get(job_id)
+        if not job:
+            return jsonify(error="Job not found"), 404
+        if subscription and job['status'] not in ('completed', 'failed'):
+            if subscription.wait(wait):
+                job = job_store.get(job_id)
+    finally:
+        if subscription:
+            job_events.unsubscribe(subscription)
+    
+    return jsonify(job_status(job))
+
+def job_event_stream(subscription, job_ids):
+    """
+    Поток Server-Sent Events: текущее состояние заданий job_ids, затем каждое
+    изменение; поток одного задания закрывается после его завершения
+    """
+    def event(job):
+        payload = dict(job_status(job), job_id=job['job_id'])
+        return f"event: job\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+    
+    def generate():
+        try:
+            changed = job_ids
+            while True:
+                if not changed:
+                    # Комментарий не дает прокси закрыть простаивающее соединение
+                    yield ": keepalive\n\n"
+                for job_id in changed:
+                    job = job_store.get(job_id)
+                    if not job:
+                        continue
+                    yield event(job)
+                    if subscription.job_id is not None and job['status'] in ('completed', 'failed'):
+                        return
+                changed = subscription.wait(JOB_EVENTS_KEEPALIVE_SEC)
+        finally:
+            job_events.unsubscribe(subscription)
+    
+    response = app.response_class(generate(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
 
-        return jsonify({
-            "status": "completed",
-            "result_url": f"/api/jobs/{job_id}/result"
-        })
+@app.route('/api/jobs/<job_id>/events', methods=['GET'])
+def get_job_events(job_id):
+    # Подписка оформляется до чтения состояния, чтобы не пропустить изменения между ними
+    subscription = job_events.subscribe(job_id)
+    if not job_store.exists(job_id):
+        job_events.unsubscribe(subscription)
+        return jsonify(error="Job not found"), 404
+    return job_event_stream(subscription, [job_id])
+
+@app.route('/api/jobs/events', methods=['GET'])
+def get_all_job_events():
+    subscription = job_events.subscribe()
+    return job_event_stream(subscription, [job['job_id'] for job in job_store.unfinished()])
 
 
 @app.route('/api/jobs/<job_id>/result', methods=['GET'])
 def get_job_result(job_id):
-    job = jobs_db.get(job_id)
+    job = job_store.get(job_id)
     if not job or job['status'] != 'completed':
         return jsonify(error="Result not ready"), 404
     
-    # Возвращаем результат в зависимости от типа задачи
-
-    return jsonify(job['result'])
+    # Результат отдается из файла, записанного при завершении задания, в сжатом виде,
+    # если клиент его принимает; ETag и ответ 304 на If-None-Match - средствами send_file
+    encoding = request.accept_encodings.best_match([*RESULT_ENCODINGS, 'identity'], default='identity')
+    response = send_file(job_store.result_path(job_id, encoding), mimetype='application/json',
+                         conditional=True, max_age=RESULT_CACHE_MAX_AGE)
+    if encoding != 'identity':
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.cache_control.public = False
+    response.cache_control.private = True
+    del response.headers['Content-Disposition']
+    return response
 
+@app.route('/api/jobs/<job_id>/result/nodes/<node_id>', methods=['GET'])
+def get_job_result_node(job_id, node_id):
+    """
+    Поддерево результата кластеризации: узел со страницей файлов
+    (?cursor=&limit=) и потомками до глубины ?depth= без их файлов
+    """
+    job = job_store.get(job_id)
+    if not job or job['status'] != 'completed':
+        return jsonify(error="Result not ready"), 404
+    
+    try:
+        depth = int(request.args.get('depth', 1))
+        cursor = int(request.args.get('cursor', 0))
+        limit = int(request.args.get('limit', 100))
+    except ValueError:
+        return jsonify(error="Invalid depth, cursor or limit"), 400
+    if depth < 0 or cursor < 0 or limit <= 0:
+        return jsonify(error="Invalid depth, cursor or limit"), 400
+    
+    node = job_store.get_node(job_id, node_id, depth, cursor, limit)
+    if node is None:
+        return jsonify(error="Node not found"), 404
+    return jsonify(node)
 
 
 @app.route('/api/semantic/search', methods=['POST'])
@@ -184,11 +464,30 @@ def perform_search():
     if not corpus_id or not model_id:
         return jsonify(error="Missing required headers"), 400
     
-    model_exists = any(m['model_id'] == model_id for m in MOCK_MODELS)
-    if not model_exists:
+    if not model_registry.describe(model_id):
         return jsonify(error="Model not found"), 404
     
-    return jsonify({"results": MOCK_SEARCH_RESULTS})
+    try:
+        result_amount = int(request.headers.get('x-result-amount', 5))
+        nprobe = int(request.headers.get('x-search-nprobe', ANN_NPROBE))
+    except ValueError:
+        return jsonify(error="Invalid x-result-amount or x-search-nprobe"), 400
+    if result_amount <= 0 or nprobe <= 0:
+        return jsonify(error="Invalid x-result-amount or x-search-nprobe"), 400
+    
+    searcher = searchers.get(corpus_id)
+    if searcher is None:
+        return jsonify(error="Corpus not found"), 404
+    
+    if searcher.meta['model_id'] != model_id:
+        return jsonify(error="Model does not match corpus model"), 400
+    
+    query = normalizer.normalize_text(request.get_data(as_text=True))
+    dimension = model_registry.describe(model_id)['dimension']
+    query_vector = embedding_cache.embed(model_id, dimension, [query],
+                                         lambda texts: embedding_batcher.embed(model_id, texts))[0]
+    
+    return jsonify({"results": searcher.search(query_vector, result_amount, nprobe)})
 
 @app.route('/api/clusterization', methods=['POST'])
 def clusterisation():
@@ -201,25 +500,24 @@ def clusterisation():
     if not corpus_path or not model_id:
         return jsonify(error="Missing required headers"), 400
     
-    model_exists = any(m['model_id'] == model_id for m in MOCK_MODELS)
-    if not model_exists:
+    if not model_registry.describe(model_id):
         return jsonify(error="Model not found"), 404
     
-    job_id = str(uuid.uuid4())
-    jobs_db[job_id] = {
-        'status': 'processing',
-        'type': 'clusterisation',
-        'progress': 0,
+    # Кластеризуется загруженный корпус: x-corpus-id или x-corpus-path содержат его corpus_id
+    corpus_id = os.path.basename((request.headers.get('x-corpus-id') or corpus_path).strip('/'))
+    searcher = searchers.get(corpus_id)
+    if searcher is None:
+        return jsonify(error="Corpus not found"), 404
+    
+    if searcher.meta['model_id'] != model_id:
+        return jsonify(error="Model does not match corpus model"), 400
+    
+    job = {
         'corpus_path': corpus_path,
-        'model_id': model_id,
-        'result': MOCK_CLUSTER_RESULT
+        'model_id': model_id
     }
-    job_creation_time[job_id] = time.time()
-    
-    return jsonify({
-        "job_id": job_id,
-        "estimated_time_min": 120
-    }), 202
+    params = dict(job, corpus_id=corpus_id)
+    return enqueue_job('clusterisation', tasks.run_clusterisation, job, params, 120)
 
 @app.route('/api/classification', methods=['POST'])
 def classification():
@@ -230,124 +528,38 @@ def classification():
     # Получаем параметры из запроса
     corpus_path = request.headers.get('x-corpus-path')
     model_id = request.headers.get('x-model-id')
+    clustering_job_id = request.headers.get('x-clustering-job-id')
     
-    if not corpus_path or not model_id:
-        return jsonify(error="Missing required headers"), 400
+    if not all([corpus_path, model_id, clustering_job_id]):
+        return jsonify(error="Missing required headers: x-corpus-path, x-model-id, x-clustering-job-id"), 400
     
     # Проверяем существование модели
-    model_exists = any(m['model_id'] == model_id for m in MOCK_MODELS)
-    if not model_exists:
+    if not model_registry.describe(model_id):
         return jsonify(error="Model not found"), 404
     
+    # Классификация идет по центроидам завершенной кластеризации той же модели
+    clustering_job = job_store.get(clustering_job_id)
+    if not clustering_job or clustering_job['type'] != 'clusterisation':
+        return jsonify(error="Clustering job not found"), 404
+    
+    if clustering_job['status'] != 'completed' or not os.path.exists(tasks.centroids_path(clustering_job_id)):
+        return jsonify(error="Clustering job not completed"), 400
+    
+    if clustering_job['model_id'] != model_id:
+        return jsonify(error="Model does not match clustering model"), 400
+    
+    root = tasks.resolve_corpus_path(corpus_path)
+    if root is None or not os.path.isdir(root):
+        return jsonify(error="Corpus path not found"), 404
+    
     # Создаем задание на классификацию
-    job_id = str(uuid.uuid4())
-    jobs_db[job_id] = {
-        'status': 'processing',
-        'type': 'classification',
-        'progress': 0,
+    job = {
         'corpus_path': corpus_path,
         'model_id': model_id,
-        'result': {
-            "folder": corpus_path,
-            "data": {
-                "id": "root",
-                "name": "Все кластеры",
-                "fileCount": 150,
-                "avgSimilarity": 0.78,
-                "children": [
-                    {
-                        "id": "cluster1",
-                        "name": "Технологии",
-                        "fileCount": 65,
-                        "avgSimilarity": 0.85,
-                        "similarityDistribution": [0.1, 0.15, 0.25, 0.3, 0.2],
-                        "files": [
-                            {"name": "new_ai_research.txt"},
-                            {"name": "tech_report.pdf"}
-                        ],
-                        "children": []
-                    },
-                    {
-                        "id": "cluster2", 
-                        "name": "Наука",
-                        "fileCount": 45,
-                        "avgSimilarity": 0.72,
-                        "similarityDistribution": [0.2, 0.25, 0.3, 0.15, 0.1],
-                        "files": [
-                            {"name": "physics_paper.txt"},
-                            {"name": "biology_study.pdf"}
-                        ],
-                        "children": []
-                    },
-                    {
-                        "id": "cluster3",
-                        "name": "Бизнес",
-                        "fileCount": 40,
-                        "avgSimilarity": 0.81,
-                        "similarityDistribution": [0.05, 0.1, 0.2, 0.3, 0.35],
-                        "files": [
-                            {"name": "market_analysis.docx"},
-                            {"name": "financial_report.pdf"}
-                        ],
-                        "children": []
-                    }
-                ]
-            },
-            "correspondence_table": {
-                "files": [
-                    {
-                        "f": "new_ai_research.txt",
-                        "d": [
-                            ["cluster1", 0.92],
-                            ["cluster2", 0.68],
-                            ["cluster3", 0.45],
-                            ["cluster4", 0.32],
-                            ["cluster5", 0.21]
-                        ]
-                    },
-                    {
-                        "f": "tech_report.pdf", 
-                        "d": [
-                            ["cluster1", 0.88],
-                            ["cluster3", 0.72],
-                            ["cluster2", 0.61],
-                            ["cluster6", 0.38],
-                            ["cluster7", 0.29]
-                        ]
-                    },
-                    {
-                        "f": "physics_paper.txt",
-                        "d": [
-                            ["cluster2", 0.95],
-                            ["cluster1", 0.63],
-                            ["cluster8", 0.42],
-                            ["cluster9", 0.31],
-                            ["cluster10", 0.24]
-                        ]
-                    }
-                ],
-                "cluster_names": {
-                    "cluster1": "Технологии",
-                    "cluster2": "Наука", 
-                    "cluster3": "Бизнес",
-                    "cluster4": "Искусство",
-                    "cluster5": "Спорт",
-                    "cluster6": "Медицина",
-                    "cluster7": "Образование",
-                    "cluster8": "Политика",
-                    "cluster9": "Экономика",
-                    "cluster10": "Путешествия"
-                }
-            },
-            "graphic_representation": "http://localhost:3000/api/visualization/graphic"
-        }
+        'clustering_job_id': clustering_job_id
     }
-    job_creation_time[job_id] = time.time()
-    
-    return jsonify({
-        "job_id": job_id,
-        "estimated_time_min": 45
-    }), 202
+    params = dict(job, model=model_registry.describe(model_id))
+    return enqueue_job('classification', tasks.run_classification, job, params, 45)
 
 @app.route('/api/classification/grnti', methods=['POST'])
 def start_grnti_classification():
@@ -360,140 +572,54 @@ def start_grnti_classification():
         return jsonify(error="Missing required headers: x-corpus-path, x-model-id, x-clustering-job-id"), 400
     
     # Проверяем существование предыдущего задания кластеризации
-    if clustering_job_id not in jobs_db:
+    if not job_store.exists(clustering_job_id):
         return jsonify(error="Clustering job not found"), 404
     
     # Проверяем существование модели
-    model_exists = any(m['model_id'] == model_id for m in MOCK_MODELS)
-    if not model_exists:
+    if not model_registry.describe(model_id):
         return jsonify(error="Model not found"), 404
     
-    # Создаем задание на классификацию по ГРНТИ с готовым результатом
-    job_id = str(uuid.uuid4())
-    jobs_db[job_id] = {
-        'status': 'processing',
-        'type': 'grnti_classification',
-        'progress': 0,
+    # Создаем задание на классификацию по ГРНТИ
+    job = {
         'corpus_path': corpus_path,
         'model_id': model_id,
-        'clustering_job_id': clustering_job_id,
-        'result': generate_grnti_mock_result({
-            'corpus_path': corpus_path,
-            'model_id': model_id,
-            'clustering_job_id': clustering_job_id,
-            'ttl_hours': request.headers.get('x-ttl-hours', 0)
-        })
+        'clustering_job_id': clustering_job_id
     }
-    job_creation_time[job_id] = time.time()
-    
-    return jsonify({
-        "job_id": job_id,
-        "estimated_time_min": 2  # Короткое время для демонстрации
-    }), 202
-
-def generate_grnti_mock_result(params):
-    """Генерация мок-результата классификации по ГРНТИ"""
-    return {
-        "folder": params['corpus_path'],
-        "model_id": params['model_id'],
-        "grnti_branch": "военное дело",
-        "classification_results": {
-            "summary": {
-                "total_files": 1000,
-                "files_classified": 1000,
-                "agreement_with_expert": 0.87,
-                "accuracy_top_3": 0.95
-            },
-            "detailed_stats": {
-                "76.01.00": {
-                    "code": "76.01.00",
-                    "name": "Общие вопросы военной науки и техники",
-                    "expert_count": 150,
-                    "system_count": 145,
-                    "true_positive": 142,
-                    "false_positive": 3,
-                    "false_negative": 8,
-                    "precision": 0.979,
-                    "recall": 0.947
-                },
-                "76.03.00": {
-                    "code": "76.03.00",
-                    "name": "Военное искусство",
-                    "expert_count": 220,
-                    "system_count": 215,
-                    "true_positive": 210,
-                    "false_positive": 5,
-                    "false_negative": 10,
-                    "precision": 0.977,
-                    "recall": 0.955
-                },
-                "76.29.05": {
-                    "code": "76.29.05",
-                    "name": "Авиационное вооружение",
-                    "expert_count": 80,
-                    "system_count": 85,
-                    "true_positive": 78,
-                    "false_positive": 7,
-                    "false_negative": 2,
-                    "precision": 0.918,
-                    "recall": 0.975
-                }
-            }
-        },
-        "files": [
-            {
-                "file": "document_0012.txt",
-                "expert_grnti_code": "76.03.01",
-                "expert_grnti_name": "Стратегия и оперативное искусство",
-                "predicted_grnti_code": "76.03.01",
-                "predicted_grnti_name": "Стратегия и оперативное искусство",
-                "similarity": 0.94,
-                "top_5_predictions": [
-                    ["76.03.01", 0.94],
-                    ["76.03.03", 0.12],
-                    ["76.01.07", 0.08],
-                    ["76.05.01", 0.05],
-                    ["76.29.05", 0.02]
-                ]
-            },
-            {
-                "file": "document_0457.txt",
-                "expert_grnti_code": "76.01.07",
-                "expert_grnti_name": "Системный анализ, управление и обработка информации в военном деле",
-                "predicted_grnti_code": "76.29.05",
-                "predicted_grnti_name": "Авиационное вооружение",
-                "similarity": 0.89,
-                "top_5_predictions": [
-                    ["76.29.05", 0.89],
-                    ["76.01.07", 0.85],
-                    ["76.03.03", 0.07],
-                    ["76.15.11", 0.04],
-                    ["76.17.01", 0.03]
-                ]
-            },
-            {
-                "file": "document_0789.txt",
-                "expert_grnti_code": "76.01.00",
-                "expert_grnti_name": "Общие вопросы военной науки и техники",
-                "predicted_grnti_code": "76.01.00",
-                "predicted_grnti_name": "Общие вопросы военной науки и техники",
-                "similarity": 0.96,
-                "top_5_predictions": [
-                    ["76.01.00", 0.96],
-                    ["76.01.07", 0.15],
-                    ["76.03.00", 0.08],
-                    ["76.29.01", 0.04],
-                    ["76.15.05", 0.02]
-                ]
-            }
-        ],
-        "confusion_matrix_url": "/api/grnti-classification/results/mock/confusion_matrix.png",
-        "report_url": "/api/grnti-classification/results/mock/detailed_report.pdf"
-    }
-
-@app.route('/api/evaluation/precision', methods=['POST'])
-def evaluate_precision():
-    """Задача 13: Синхронная оценка точности классификации"""
+    root = tasks.resolve_corpus_path(corpus_path)
+    if root is None or not os.path.isdir(root):
+        return jsonify(error="Corpus path not found"), 404
+    
+    # Экспертные рубрики файлов, если есть, попадают в результат и его сводку
+    ground_truth, error = read_ground_truth()
+    if error:
+        return error
+    
+    params = dict(job, ttl_hours=request.headers.get('x-ttl-hours', 0), model=model_registry.describe(model_id),
+                  ground_truth=ground_truth)
+    return enqueue_job('grnti_classification', tasks.run_grnti_classification, job, params,
+                       2)  # Короткое время для демонстрации
+
+def read_ground_truth():
+    """
+    Экспертная разметка из тела запроса: {"ground_truth": {"<файл>": "<код кластера или рубрики>"}}
+    Возвращает (разметка или None, ответ с ошибкой или None)
+    """
+    body = request.get_json(silent=True)
+    ground_truth = body.get('ground_truth') if isinstance(body, dict) else None
+    if ground_truth is not None and not (
+            isinstance(ground_truth, dict) and all(isinstance(label, str) for label in ground_truth.values())):
+        return None, (jsonify(error="ground_truth must map file names to labels"), 400)
+    return ground_truth, None
+
+# Тип оценки (x-evaluation-type) -> тип задания классификации, которое им оценивается
+EVALUATION_JOB_TYPES = {'cluster': 'classification', 'grnti': 'grnti_classification'}
+
+def run_evaluation(metric):
+    """
+    Оценка задания классификации по метрике precision или recall с кэшированием
+    Метрики файлов: полностью (по умолчанию), страницами (?cursor=&limit=),
+    без них (?file_metrics=none) или потоком NDJSON (Accept: application/x-ndjson)
+    """
     
     # Получаем параметры из заголовков
     classification_job_id = request.headers.get('x-classification-job-id')
@@ -503,302 +629,84 @@ def evaluate_precision():
     if not classification_job_id or not eval_type:
         return jsonify(error="Missing required headers: x-classification-job-id, x-evaluation-type"), 400
     
-    if classification_job_id not in jobs_db:
+    try:
+        threshold = float(request.headers.get('x-threshold', 0.8))
+        cursor = int(request.args.get('cursor', 0))
+        limit = int(request.args['limit']) if 'limit' in request.args else None
+    except ValueError:
+        return jsonify(error="Invalid x-threshold, cursor or limit"), 400
+    if cursor < 0 or (limit is not None and limit <= 0):
+        return jsonify(error="Invalid x-threshold, cursor or limit"), 400
+    
+    ground_truth, error = read_ground_truth()
+    if error:
+        return error
+    
+    classification_job = job_store.get(classification_job_id)
+    if not classification_job:
         return jsonify(error="Classification job not found"), 404
     
-    classification_job = jobs_db[classification_job_id]
     if classification_job.get('status') != 'completed':
         return jsonify(error="Classification job not completed"), 400
     
-    # Вычисляем метрики precision
-    classification_result = classification_job['result']
-    
-    if eval_type == 'grnti':
-        result = calculate_grnti_precision(classification_result)
-    else:
-        result = calculate_cluster_precision(classification_result)
+    if EVALUATION_JOB_TYPES.get(eval_type) != classification_job['type']:
+        return jsonify(error=f"Evaluation type {eval_type} does not match job type {classification_job['type']}"), 400
+    
+    # Время завершения входит в ключ: повторный запуск задания дает новый результат.
+    # Разметка входит в ключ хешем. Метрика и порог в ключ не входят: отчет содержит
+    # precision и recall, а порог влияет только на threshold_met
+    ground_truth_hash = None
+    if ground_truth is not None:
+        ground_truth_hash = hashlib.blake2b(
+            json.dumps(ground_truth, sort_keys=True, ensure_ascii=False).encode('utf-8'), digest_size=16).hexdigest()
+    cache_key = (classification_job_id, classification_job['finished_at'], eval_type, ground_truth_hash)
+    evaluation = evaluation_cache.get(cache_key)
+    cache_status = 'hit'
+    if evaluation is None:
+        # Вычисляем метрики
+        classification_result = job_store.get_result(classification_job_id)
+        evaluation = evaluate_classification(classification_result, eval_type, ground_truth)
+        evaluation_cache.put(cache_key, evaluation)
+        cache_status = 'miss'
+    
+    if evaluation.total_files == 0:
+        return jsonify(error="no ground truth for this job"), 400
     
     # Добавляем информацию о задании
+    result = dict(evaluation.report)
     result['classification_job_id'] = classification_job_id
-    result['evaluation_type'] = 'precision'
+    result['evaluation_type'] = metric
     result['classification_type'] = eval_type
-    result['threshold'] = 0.8
-    result['threshold_met'] = result['metrics']['precision'] >= 0.8
-    
-    return jsonify(result)
-
-def calculate_grnti_precision(grnti_result):
-    """Расчет precision для классификации по ГРНТИ"""
-    total_tp, total_fp, total_fn = 0, 0, 0
-    file_level_metrics = []
-    
-    for file_data in grnti_result['files']:
-        # Экспертная оценка
-        expert_label = file_data['expert_grnti_code']
-        
-        # Предсказания системы (топ-5)
-        system_predictions = file_data['top_5_predictions']
-        system_classes = {pred[0] for pred in system_predictions}
-        
-        # Расчет метрик для файла
-        tp = 1 if expert_label in system_classes else 0
-        fp = len(system_classes) - tp
-        fn = 1 - tp
-        
-        precision = tp / (tp + fp) if (tp + fp) > 0 else 0
-        
-        total_tp += tp
-        total_fp += fp
-        total_fn += fn
-        
-        file_level_metrics.append({
-            "file": file_data['file'],
-            "expert_label": expert_label,
-            "system_predictions": system_predictions,
-            "tp": tp,
-            "fp": fp,
-            "fn": fn,
-            "precision": precision,
-            "match_found": tp > 0
-        })
-    
-    # Итоговые метрики
-    final_precision = total_tp / (total_tp + total_fp) if (total_tp + total_fp) > 0 else 0
-    
-    return {
-        "metrics": {
-            "total_files": len(grnti_result['files']),
-            "total_tp": total_tp,
-            "total_fp": total_fp,
-            "total_fn": total_fn,
-            "precision": round(final_precision, 4)
-        },
-        "file_level_metrics": file_level_metrics,
-        "summary": {
-            "files_with_matches": total_tp,
-            "files_without_matches": len(grnti_result['files']) - total_tp,
-            "average_precision": round(final_precision, 4)
-        }
-    }
+    result['threshold'] = threshold
+    result['threshold_met'] = result['metrics'][metric] >= threshold
+    
+    if request.accept_mimetypes.best_match(['application/json', 'application/x-ndjson']) == 'application/x-ndjson':
+        # Первая строка - агрегированный отчет, далее по строке на файл
+        def generate():
+            yield json.dumps(result, ensure_ascii=False) + '\n'
+            for file_metrics in evaluation.file_metrics(cursor):
+                yield json.dumps(file_metrics, ensure_ascii=False) + '\n'
+        response = app.response_class(generate(), mimetype='application/x-ndjson')
+    else:
+        if request.args.get('file_metrics') != 'none':
+            stop = cursor + limit if limit is not None else None
+            result['file_level_metrics'] = list(evaluation.file_metrics(cursor, stop))
+            if limit is not None:
+                result['next_cursor'] = stop if stop < evaluation.total_files else None
+        response = jsonify(result)
+    
+    response.headers['x-cache'] = cache_status
+    return response
 
-def calculate_cluster_precision(cluster_result):
-    """Расчет precision для кластерной классификации"""
-    total_tp, total_fp, total_fn = 0, 0, 0
-    file_level_metrics = []
-    
-    # Mapping экспертных оценок к файлам (в реальной системе это должно приходить извне)
-    expert_mapping = {
-        "new_ai_research.txt": "cluster1",
-        "tech_report.pdf": "cluster1",
-        "physics_paper.txt": "cluster2",
-        "biology_study.pdf": "cluster2",
-        "market_analysis.docx": "cluster3",
-        "financial_report.pdf": "cluster3",
-        "file001.txt": "c1",
-        "file002.txt": "c2"
-    }
-    
-    for file_data in cluster_result['correspondence_table']['files']:
-        filename = file_data['f']
-        expert_label = expert_mapping.get(filename, "unknown")
-        system_predictions = file_data['d']
-        system_classes = {pred[0] for pred in system_predictions}
-        
-        # Расчет метрик для файла
-        tp = 1 if expert_label in system_classes else 0
-        fp = len(system_classes) - tp
-        fn = 1 - tp
-        
-        precision = tp / (tp + fp) if (tp + fp) > 0 else 0
-        
-        total_tp += tp
-        total_fp += fp
-        total_fn += fn
-        
-        file_level_metrics.append({
-            "file": filename,
-            "expert_label": expert_label,
-            "system_predictions": system_predictions,
-            "tp": tp,
-            "fp": fp,
-            "fn": fn,
-            "precision": precision,
-            "match_found": tp > 0
-        })
-    
-    # Итоговые метрики
-    final_precision = total_tp / (total_tp + total_fp) if (total_tp + total_fp) > 0 else 0
-    
-    return {
-        "metrics": {
-            "total_files": len(cluster_result['correspondence_table']['files']),
-            "total_tp": total_tp,
-            "total_fp": total_fp,
-            "total_fn": total_fn,
-            "precision": round(final_precision, 4)
-        },
-        "file_level_metrics": file_level_metrics,
-        "summary": {
-            "files_with_matches": total_tp,
-            "files_without_matches": len(cluster_result['correspondence_table']['files']) - total_tp,
-            "average_precision": round(final_precision, 4)
-        }
-    }
+@app.route('/api/evaluation/precision', methods=['POST'])
+def evaluate_precision():
+    """Задача 13: Синхронная оценка точности классификации"""
+    return run_evaluation('precision')
 
 @app.route('/api/evaluation/recall', methods=['POST'])
 def evaluate_recall():
     """Задача 14: Синхронная оценка полноты классификации"""
-    
-    # Получаем параметры из заголовков
-    classification_job_id = request.headers.get('x-classification-job-id')
-    eval_type = request.headers.get('x-evaluation-type')  # cluster или grnti
-    
-    # Валидация параметров
-    if not classification_job_id or not eval_type:
-        return jsonify(error="Missing required headers: x-classification-job-id, x-evaluation-type"), 400
-    
-    if classification_job_id not in jobs_db:
-        return jsonify(error="Classification job not found"), 404
-    
-    classification_job = jobs_db[classification_job_id]
-    if classification_job.get('status') != 'completed':
-        return jsonify(error="Classification job not completed"), 400
-    
-    # Вычисляем метрики recall
-    classification_result = classification_job['result']
-    
-    if eval_type == 'grnti':
-        result = calculate_grnti_recall(classification_result)
-    else:
-        result = calculate_cluster_recall(classification_result)
-    
-    # Добавляем информацию о задании
-    result['classification_job_id'] = classification_job_id
-    result['evaluation_type'] = 'recall'
-    result['classification_type'] = eval_type
-    result['threshold'] = 0.8
-    result['threshold_met'] = result['metrics']['recall'] >= 0.8
-    
-    return jsonify(result)
-
-def calculate_grnti_recall(grnti_result):
-    """Расчет recall для классификации по ГРНТИ"""
-    total_tp, total_fp, total_fn = 0, 0, 0
-    file_level_metrics = []
-    
-    for file_data in grnti_result['files']:
-        # Экспертная оценка
-        expert_label = file_data['expert_grnti_code']
-        
-        # Предсказания системы (топ-5)
-        system_predictions = file_data['top_5_predictions']
-        system_classes = {pred[0] for pred in system_predictions}
-        
-        # Расчет метрик для файла
-        tp = 1 if expert_label in system_classes else 0
-        fp = len(system_classes) - tp
-        fn = 1 - tp  # Для recall важно считать false negatives
-        
-        recall = tp / (tp + fn) if (tp + fn) > 0 else 0  # Формула recall: TP / (TP + FN)
-        
-        total_tp += tp
-        total_fp += fp
-        total_fn += fn
-        
-        file_level_metrics.append({
-            "file": file_data['file'],
-            "expert_label": expert_label,
-            "system_predictions": system_predictions,
-            "tp": tp,
-            "fp": fp,
-            "fn": fn,
-            "recall": recall,  # Изменено с precision на recall
-            "match_found": tp > 0
-        })
-    
-    # Итоговые метрики - используем формулу recall
-    final_recall = total_tp / (total_tp + total_fn) if (total_tp + total_fn) > 0 else 0
-    
-    return {
-        "metrics": {
-            "total_files": len(grnti_result['files']),
-            "total_tp": total_tp,
-            "total_fp": total_fp,
-            "total_fn": total_fn,
-            "recall": round(final_recall, 4)  # Изменено с precision на recall
-        },
-        "file_level_metrics": file_level_metrics,
-        "summary": {
-            "files_with_matches": total_tp,
-            "files_without_matches": len(grnti_result['files']) - total_tp,
-            "average_recall": round(final_recall, 4)  # Изменено с precision на recall
-        }
-    }
-
-def calculate_cluster_recall(cluster_result):
-    """Расчет recall для кластерной классификации"""
-    total_tp, total_fp, total_fn = 0, 0, 0
-    file_level_metrics = []
-    
-    # Mapping экспертных оценок к файлам (в реальной системе это должно приходить извне)
-    expert_mapping = {
-        "new_ai_research.txt": "cluster1",
-        "tech_report.pdf": "cluster1",
-        "physics_paper.txt": "cluster2",
-        "biology_study.pdf": "cluster2",
-        "market_analysis.docx": "cluster3",
-        "financial_report.pdf": "cluster3",
-        "file001.txt": "c1",
-        "file002.txt": "c2"
-    }
-    
-    # Исправленный путь к файлам в кластерной классификации
-    for file_data in cluster_result['correspondence_table']['files']:
-        filename = file_data['f']
-        expert_label = expert_mapping.get(filename, "unknown")
-        system_predictions = file_data['d']
-        system_classes = {pred[0] for pred in system_predictions}
-        
-        # Расчет метрик для файла
-        tp = 1 if expert_label in system_classes else 0
-        fp = len(system_classes) - tp
-        fn = 1 - tp
-        
-        recall = tp / (tp + fn) if (tp + fn) > 0 else 0  # Формула recall
-        
-        total_tp += tp
-        total_fp += fp
-        total_fn += fn
-        
-        file_level_metrics.append({
-            "file": filename,
-            "expert_label": expert_label,
-            "system_predictions": system_predictions,
-            "tp": tp,
-            "fp": fp,
-            "fn": fn,
-            "recall": recall,
-            "match_found": tp > 0
-        })
-    
-    # Итоговые метрики - используем формулу recall
-    final_recall = total_tp / (total_tp + total_fn) if (total_tp + total_fn) > 0 else 0
-    
-    return {
-        "metrics": {
-            "total_files": len(cluster_result['correspondence_table']['files']),
-            "total_tp": total_tp,
-            "total_fp": total_fp,
-            "total_fn": total_fn,
-            "recall": round(final_recall, 4)
-        },
-        "file_level_metrics": file_level_metrics,
-        "summary": {
-            "files_with_matches": total_tp,
-            "files_without_matches": len(cluster_result['correspondence_table']['files']) - total_tp,
-            "average_recall": round(final_recall, 4)
-        }
-    }
+    return run_evaluation('recall')
 
 @app.route('/api/fine-tuning/start', methods=['POST'])
 def start_fine_tuning():
@@ -808,8 +716,7 @@ def start_fine_tuning():
             return jsonify(error="Missing X-Base-Model-ID header"), 400
         
         # Проверяем существование модели
-        model_exists = any(m['model_id'] == base_model_id for m in MOCK_MODELS)
-        if not model_exists:
+        if not model_registry.describe(base_model_id):
             return jsonify(error="Base model not found"), 404
         
         # Симулируем обработку файлов (в реальности здесь бы читались файлы из form-data)
@@ -827,21 +734,11 @@ def start_fine_tuning():
         print(f"Max file size: {max_file_size}")
         print(f"File extensions: {file_extensions}")
         
-        job_id = str(uuid.uuid4())
-        jobs_db[job_id] = {
-            'status': 'processing',
-            'type': 'fine_tuning',
-            'progress': 0,
+        job = {
             'base_model_id': base_model_id,
-            'new_model_name': new_model_name,
-            'result': MOCK_FINE_TUNING_RESULT
+            'new_model_name': new_model_name
         }
-        job_creation_time[job_id] = time.time()
-        
-        return jsonify({
-            "job_id": job_id,
-            "estimated_time_min": 60
-        }), 202
+        return enqueue_job('fine_tuning', tasks.run_fine_tuning, job, job, 60)
         
     except Exception as e:
         print(f"Error in fine-tuning: {e}")
@@ -850,16 +747,17 @@ def start_fine_tuning():
 @app.route('/api/fine-tuning/history', methods=['GET'])
 def get_fine_tuning_history():
     history = []
-    for job_id, job in jobs_db.items():
-        if job['type'] == 'fine_tuning' and job['status'] == 'completed':
-            history.append({
-                "job_id": job_id,
-                "base_model_id": job['base_model_id'],
-                "new_model_id": job['result']['new_model_id'],
-                "status": job['status'],
-                "created_at": job_creation_time.get(job_id, time.time()),
-                "training_time": job['result']['training_time']
-            })
+    for job in job_store.find('fine_tuning', 'completed'):
+        if 'new_model_id' not in job:
+            continue
+        history.append({
+            "job_id": job['job_id'],
+            "base_model_id": job['base_model_id'],
+            "new_model_id": job['new_model_id'],
+            "status": job['status'],
+            "created_at": job['created_at'],
+            "training_time": job['training_time']
+        })
     return jsonify(history)
 
 # Обработчики ошибок
@@ -879,5 +777,56 @@ def too_many_requests(error):
 def internal_error(error):
     return jsonify(error="Internal server error"), 500
 
+def resume_unfinished_jobs():
+    """Повторно ставит в очередь задания, прерванные перезапуском"""
+    for job in job_store.unfinished():
+        job_store.update(job['job_id'], status='queued', progress=0)
+        try:
+            job_engine.submit(job['job_id'], job['type'], getattr(tasks, job['task']), job['params'])
+        except QueueFullError:
+            job_store.fail(job['job_id'], "Job queue is full after restart")
+
+def start():
+    """
+    Создает службы бэкенда, регистрирует дообученные модели, возобновляет задания,
+    прерванные перезапуском, и возвращает приложение; для WSGI-сервера: 'app:start()'
+    """
+    global job_store, job_engine, job_events, model_registry
+    global embedding_batcher, embedding_cache, searchers, evaluation_cache
+
+    # База данных для хранения заданий
+    job_store = JobStore(JOB_DB_PATH, JOB_RESULTS_PATH)
+
+    # Движок фоновых заданий
+    job_engine = JobEngine(job_store, JOB_WORKERS, JOB_QUEUE_SIZE, JOB_TYPE_LIMITS)
+
+    # Уведомления подписчиков об изменении заданий
+    job_events = JobEvents()
+    job_engine.add_update_listener(job_events.publish)
+
+    # Реестр моделей: базовые модели и завершенные дообучения
+    model_registry = ModelRegistry(MOCK_MODELS, MODEL_CACHE_MAX_BYTES)
+    for fine_tuning_job in job_store.find('fine_tuning', 'completed'):
+        register_fine_tuned_model(fine_tuning_job['job_id'], 'fine_tuning', 'completed')
+    job_engine.add_listener(register_fine_tuned_model)
+
+    # Объединение одновременных запросов эмбеддингов к одной модели
+    embedding_batcher = MicroBatcher(infer_embeddings, EMBEDDING_COALESCE_MAX_BATCH, EMBEDDING_COALESCE_MAX_WAIT_MS)
+
+    # Эмбеддинги уже встречавшихся поисковых запросов
+    embedding_cache = EmbeddingCache(EMBEDDING_CACHE_PATH, EMBEDDING_CACHE_SIZE, EMBEDDING_CACHE_DISK_SIZE)
+
+    # Открытые для поиска корпуса
+    searchers = SearcherCache(CORPORA_PATH, SEARCH_CACHE_SIZE)
+
+    # Готовые оценки заданий классификации
+    evaluation_cache = EvaluationCache(EVALUATION_CACHE_SIZE)
+
+    resume_unfinished_jobs()
+    return app
+
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=3000, debug=True)
\ No newline at end of file
+    # Наблюдатель перезагрузчика Flask запросы не обслуживает, службы создает его дочерний процесс
+    if not DEBUG or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start()
+    app.run(host='0.0.0.0', port=3000, debug=DEBUG)
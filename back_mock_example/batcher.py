@@ -0,0 +1,83 @@
+"""
+Динамическое объединение запросов эмбеддингов
+Одновременные запросы к одной модели собираются в общий пакет (до max_batch_size
+текстов или max_wait_ms ожидания), модель вызывается один раз, результаты
+раздаются ожидающим запросам
+"""
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+
+class MicroBatcher:
+    """Объединяет вызовы infer(key, texts) с одинаковым ключом в пакеты"""
+
+    def __init__(self, infer, max_batch_size, max_wait_ms):
+        self._infer = infer
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._cond = threading.Condition()
+        self._pending = {}
+        self._workers = set()
+
+    def embed(self, key, texts):
+        """Эмбеддинги texts; блокирует поток до готовности пакета"""
+        if len(texts) >= self.max_batch_size or self.max_wait <= 0:
+            return self._infer(key, texts)
+
+        future = Future()
+        with self._cond:
+            self._pending.setdefault(key, []).append((texts, future))
+            if key not in self._workers:
+                self._workers.add(key)
+                threading.Thread(target=self._run, args=(key,), daemon=True).start()
+            self._cond.notify_all()
+        return future.result()
+
+    def _take_batch(self, key):
+        """Ждет наполнения пакета или истечения max_wait; возвращает пакет и признак опустевшей очереди"""
+        with self._cond:
+            deadline = time.monotonic() + self.max_wait
+            while True:
+                pending = self._pending.get(key, [])
+                count = sum(len(texts) for texts, _ in pending)
+                remaining = deadline - time.monotonic()
+                if count >= self.max_batch_size or remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            batch, count = [], 0
+            while pending and count + len(pending[0][0]) <= self.max_batch_size:
+                batch.append(pending.pop(0))
+                count += len(batch[-1][0])
+            if not batch and pending:
+                batch.append(pending.pop(0))
+            last = not pending
+            if last:
+                # Очередь пуста: обработчик завершается, следующий запрос запустит новый
+                self._pending.pop(key, None)
+                self._workers.discard(key)
+            return batch, last
+
+    def _run(self, key):
+        last = False
+        while not last:
+            batch, last = self._take_batch(key)
+            if batch:
+                self._dispatch(key, batch)
+
+    def _dispatch(self, key, batch):
+        texts = [text for request_texts, _ in batch for text in request_texts]
+        try:
+            vectors = self._infer(key, texts)
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        start = 0
+        for request_texts, future in batch:
+            future.set_result(np.asarray(vectors[start:start + len(request_texts)]))
+            start += len(request_texts)
@@ -0,0 +1,146 @@
+"""
+Замер скорости нормализации текста на одном ядре (МБ/с)
+
+Без аргументов текст генерируется детерминированно (seed) и похож на реальный
+русский корпус: словарь из сотен тысяч словоформ с частотами по закону Ципфа,
+заглавные буквы в начале предложений, пунктуация, кавычки, числа, перенос строк
+и переносы слов. С --corpus измеряется на файлах .txt указанного каталога.
+Печатает скорость первого прохода (кэш пуст, каждая новая словоформа
+анализируется) и повторного (кэш прогрет), а также счетчики кэша.
+С --lowercase морфологический анализатор не используется, даже если
+установлен: измеряется сам конвейер нормализации и кэш.
+
+    python benchmarks/normalize.py [--size-mb 32] [--vocabulary 400000] [--corpus DIR] [--lowercase]
+"""
+import argparse
+import itertools
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import normalizer  # noqa: E402
+from config import NORMALIZER_CACHE_SIZE  # noqa: E402
+
+_SYLLABLES = ('ба ве ги до жу за ки ло ми на но пе ра ро си та ту фе хо це чи ша щу эр юн ял '
+              'бор вод гор дел жен зем кол лес мир нос пол рук сил сто тер ход цен час шаг').split()
+_ENDINGS = ('', 'а', 'ы', 'у', 'ой', 'ом', 'е', 'ов', 'ам', 'ами', 'ах', 'ий', 'ая', 'ое', 'ые', 'ого',
+            'ому', 'ым', 'их', 'ать', 'ает', 'ают', 'ал', 'ала', 'али', 'ение', 'ения', 'ости')
+_STOP_WORDS = sorted(normalizer.STOP_WORDS)
+
+
+def _vocabulary(size, rng):
+    """Словоформы: основы из слогов с окончаниями, каждая основа - в нескольких формах"""
+    words = []
+    seen = set()
+    while len(words) < size:
+        stem = ''.join(rng.choice(_SYLLABLES) for _ in range(rng.randint(1, 4)))
+        for ending in rng.sample(_ENDINGS, 6):
+            word = stem + ending
+            if word not in seen:
+                seen.add(word)
+                words.append(word)
+    return words[:size]
+
+
+def generate_text(size_bytes, vocabulary_size, seed=0):
+    """Текст не меньше size_bytes байт UTF-8 со словами по закону Ципфа"""
+    rng = random.Random(seed)
+    words = _vocabulary(vocabulary_size, rng)
+    cum_weights = list(itertools.accumulate(1 / rank for rank in range(1, len(words) + 1)))
+    lines = []
+    line = []
+    line_chars = size = 0
+    while size < size_bytes:
+        sentence = rng.choices(words, cum_weights=cum_weights, k=rng.randint(5, 20))
+        for i in range(len(sentence)):
+            if rng.random() < 0.35:
+                sentence[i] = rng.choice(_STOP_WORDS)
+        sentence[0] = sentence[0].capitalize()
+        if rng.random() < 0.1:
+            i = rng.randrange(len(sentence))
+            sentence[i] = f'«{sentence[i]}»'
+        if rng.random() < 0.1:
+            sentence.insert(rng.randrange(len(sentence)), str(rng.randint(1, 2000)))
+        for i in range(len(sentence) - 1):
+            if rng.random() < 0.08:
+                sentence[i] += rng.choice((',', ',', ';', ':', ' —'))
+        sentence[-1] += rng.choice(('.', '.', '.', '!', '?', '...'))
+        for word in sentence:
+            if line_chars + len(word) > 72:
+                # Перенос части длинных слов на следующую строку через дефис
+                if len(word) > 7 and rng.random() < 0.2:
+                    line.append(word[:4] + '-')
+                    word = word[4:]
+                text = ' '.join(line)
+                lines.append(text)
+                size += len(text.encode('utf-8')) + 1
+                line, line_chars = [], 0
+            line.append(word)
+            line_chars += len(word) + 1
+        if rng.random() < 0.05:
+            lines.append('')
+    lines.append(' '.join(line))
+    return '\n'.join(lines)
+
+
+def read_corpus(path, size_bytes):
+    """Файлы .txt каталога path (не больше size_bytes байт в сумме)"""
+    parts = []
+    size = 0
+    for root, _, files in os.walk(path):
+        for name in sorted(files):
+            if not name.endswith('.txt') or size >= size_bytes:
+                continue
+            with open(os.path.join(root, name), 'rb') as f:
+                data = f.read(size_bytes - size)
+            size += len(data)
+            parts.append(data.decode('utf-8', errors='replace'))
+    return '\n'.join(parts)
+
+
+def measure(text, repeats):
+    """Лучшее время normalize_text(text) из repeats запусков (процессорное время)"""
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.process_time()
+        normalizer.normalize_text(text)
+        best = min(best, time.process_time() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--size-mb', type=float, default=32)
+    parser.add_argument('--vocabulary', type=int, default=400000)
+    parser.add_argument('--cache-size', type=int, default=NORMALIZER_CACHE_SIZE)
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--corpus')
+    parser.add_argument('--lowercase', action='store_true')
+    args = parser.parse_args()
+
+    size_bytes = int(args.size_mb * 1024 * 1024)
+    if args.corpus:
+        text = read_corpus(args.corpus, size_bytes)
+    else:
+        text = generate_text(size_bytes, args.vocabulary, args.seed)
+    size = len(text.encode('utf-8'))
+
+    if args.lowercase:
+        normalizer.pymorphy3 = None
+    normalizer.configure(args.cache_size)
+    cold = measure(text, 1)
+    warm = measure(text, args.repeats)
+    info = normalizer.cache_info()
+    print(f"text: {size / 1e6:.1f} MB, {len(set(text.split()))} distinct tokens, "
+          f"analyzer: {info['analyzer']}, cache size: {args.cache_size}")
+    print(f"cold: {size / cold / 1e6:.1f} MB/s")
+    print(f"warm: {size / warm / 1e6:.1f} MB/s")
+    print(f"cache: {info}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+Классификация документов по кластерам завершенной кластеризации
+Векторы документов сравниваются с сохраненными центроидами узлов дерева
+одним умножением матриц на блок документов; классами служат листья дерева
+"""
+import numpy as np
+
+from stats import node_stats
+
+
+def _round_list(values):
+    return [round(float(value), 4) for value in values]
+
+
+def classify_documents(vectors, file_names, clusters, top_k, block_size=65536):
+    """
+    Ближайшие top_k листовых кластеров каждого документа (clusters - результат
+    load_centroids) в формате результата классификации: дерево распределения
+    документов по кластерам и таблица соответствия
+    """
+    ids, names = clusters['ids'].tolist(), clusters['names'].tolist()
+    root = ids.index('root')
+    leaves = np.flatnonzero(clusters['leaves'])
+    centroids_t = np.ascontiguousarray(clusters['centroids'].T)
+    top_k = min(top_k, len(leaves))
+
+    count = len(vectors)
+    top = np.empty((count, top_k), dtype=np.int64)
+    scores = np.empty((count, top_k), dtype=np.float32)
+    root_scores = np.empty(count, dtype=np.float32)
+    for start in range(0, count, block_size):
+        block = np.asarray(vectors[start:start + block_size], dtype=np.float32)
+        end = start + len(block)
+        sims = block @ centroids_t
+        root_scores[start:end] = sims[:, root]
+        sims = sims[:, leaves]
+        rows = np.arange(len(block))[:, None]
+        best = np.argpartition(-sims, top_k - 1, axis=1)[:, :top_k]
+        best = best[rows, np.argsort(-sims[rows, best], axis=1)]
+        top[start:end] = best
+        scores[start:end] = sims[rows, best]
+
+    # Узел 0 - корень, узел i + 1 - i-й лист; документ относится к лучшему листу
+    labels = top[:, 0]
+    counts, averages, distributions = node_stats(
+        np.concatenate([np.zeros(count, dtype=np.int64), labels + 1]),
+        np.concatenate([root_scores, scores[:, 0]]),
+        len(leaves) + 1
+    )
+    order = np.lexsort((-scores[:, 0], labels))
+    members = np.split(order, np.cumsum(counts[1:])[:-1])
+
+    children = [{
+        "id": ids[leaf],
+        "name": names[leaf],
+        "fileCount": int(counts[i + 1]),
+        "avgSimilarity": round(float(averages[i + 1]), 4),
+        "similarityDistribution": _round_list(distributions[i + 1]),
+        "files": [{"name": file_names[j]} for j in members[i]],
+        "children": []
+    } for i, leaf in enumerate(leaves) if counts[i + 1]]
+
+    return {
+        "data": {
+            "id": "root",
+            "name": names[root],
+            "fileCount": count,
+            "avgSimilarity": round(float(averages[0]), 4),
+            "similarityDistribution": _round_list(distributions[0]),
+            "children": children
+        },
+        "correspondence_table": {
+            "files": [{
+                "f": file_names[j],
+                "d": [[ids[leaves[label]], round(score, 4)] for label, score in zip(top[j].tolist(), scores[j].tolist())]
+            } for j in range(count)],
+            "cluster_names": {ids[leaf]: names[leaf] for leaf in leaves}
+        }
+    }
@@ -0,0 +1,301 @@
+"""
+Кластеризация документов корпуса
+Вектор документа - нормированное среднее векторов его абзацев, матрица
+документов хранится рядом с корпусом и открывается через mmap. Центроиды
+обучаются мини-пакетным сферическим k-means по случайным пакетам строк,
+число кластеров выбирается по упрощенному силуэту на выборке. Назначение
+кластеров идет блоками в пуле потоков (умножение матриц в NumPy отпускает GIL),
+поддеревья иерархии делятся независимо в пуле процессов
+"""
+import itertools
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+
+from stats import node_stats
+
+FILE_VECTORS = 'file_vectors.npy'
+
+
+def _normalize(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+def build_file_vectors(store, path, block_size=65536):
+    """
+    Матрица (число файлов, d) векторов документов в порядке store.files
+    Считается один раз потоковым проходом по абзацам и кэшируется в каталоге корпуса
+    """
+    target = os.path.join(path, FILE_VECTORS)
+    if os.path.exists(target):
+        return np.load(target, mmap_mode='r')
+
+    tmp = target + '.tmp'
+    sums = np.lib.format.open_memmap(tmp, mode='w+', dtype=np.float32,
+                                     shape=(len(store.files), store.dimension))
+    for start in range(0, store.count, block_size):
+        files = np.asarray(store.paragraphs['file'][start:start + block_size])
+        block = np.asarray(store.vectors[start:start + block_size], dtype=np.float32)
+        # Абзацы одного файла в блоке суммируются одним reduceat после сортировки
+        order = np.argsort(files, kind='stable')
+        files = files[order]
+        starts = np.flatnonzero(np.r_[True, files[1:] != files[:-1]])
+        sums[files[starts]] += np.add.reduceat(block[order], starts, axis=0)
+    for start in range(0, len(sums), block_size):
+        sums[start:start + block_size] = _normalize(sums[start:start + block_size])
+    sums.flush()
+    del sums
+    os.replace(tmp, target)
+    return np.load(target, mmap_mode='r')
+
+
+def assign(vectors, centroids, reference=None, block_size=65536, threads=1):
+    """
+    Ближайший центроид каждой строки и косинусы до ближайшего и второго по
+    близости центроида; с reference - еще и косинус до него (центроид родителя)
+    за тот же проход
+    """
+    count, k = len(vectors), len(centroids)
+    matrix = centroids if reference is None else np.vstack([centroids, reference])
+    matrix = np.ascontiguousarray(matrix.T, dtype=np.float32)
+    labels = np.empty(count, dtype=np.int32)
+    best = np.empty(count, dtype=np.float32)
+    second = np.full(count, -1.0, dtype=np.float32)
+    to_reference = np.empty(count, dtype=np.float32) if reference is not None else None
+
+    def assign_block(start):
+        block = np.asarray(vectors[start:start + block_size], dtype=np.float32)
+        end = start + len(block)
+        sims = block @ matrix
+        if to_reference is not None:
+            to_reference[start:end] = sims[:, k]
+            sims = sims[:, :k]
+        rows = np.arange(len(block))
+        top = np.argmax(sims, axis=1)
+        labels[start:end] = top
+        best[start:end] = sims[rows, top]
+        if k > 1:
+            sims[rows, top] = -np.inf
+            second[start:end] = sims.max(axis=1)
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(assign_block, range(0, count, block_size)))
+    return labels, best, second, to_reference
+
+
+def minibatch_kmeans(vectors, k, batch_size=1024, iterations=100, seed=0):
+    """
+    Мини-пакетный сферический k-means (шаг центроида 1/число назначенных ему
+    точек); читает только случайные пакеты строк vectors
+    """
+    rng = np.random.default_rng(seed)
+    count = len(vectors)
+    centroids = np.asarray(vectors[np.sort(rng.choice(count, size=k, replace=False))], dtype=np.float32)
+    seen = np.zeros(k, dtype=np.int64)
+    for _ in range(iterations):
+        ids = np.sort(rng.choice(count, size=min(batch_size, count), replace=False))
+        batch = np.asarray(vectors[ids], dtype=np.float32)
+        labels = np.argmax(batch @ centroids.T, axis=1)
+        batch_counts = np.bincount(labels, minlength=k)
+        hit = np.flatnonzero(batch_counts)
+
+        order = np.argsort(labels, kind='stable')
+        starts = (np.cumsum(batch_counts) - batch_counts)[hit]
+        means = np.add.reduceat(batch[order], starts, axis=0) / batch_counts[hit, None]
+
+        seen[hit] += batch_counts[hit]
+        eta = (batch_counts[hit] / seen[hit])[:, None].astype(np.float32)
+        centroids[hit] = _normalize((1 - eta) * centroids[hit] + eta * means)
+    return centroids
+
+
+def simplified_silhouette(best, second):
+    """Средний силуэт по расстояниям до ближайшего и второго центроида"""
+    a, b = 1 - best, 1 - second
+    return float(np.mean((b - a) / np.maximum(np.maximum(a, b), 1e-12)))
+
+
+def choose_k(sample, max_k, batch_size=1024, iterations=100, seed=0):
+    """Число кластеров от 2 до max_k с наибольшим упрощенным силуэтом на выборке"""
+    best_k, best_score = 1, -np.inf
+    for k in range(2, min(max_k, len(sample) - 1) + 1):
+        centroids = minibatch_kmeans(sample, k, batch_size, iterations, seed)
+        _, best, second, _ = assign(sample, centroids)
+        score = simplified_silhouette(best, second)
+        if score > best_score:
+            best_k, best_score = k, score
+    return best_k
+
+
+def cluster_vectors(vectors, max_k, sample_size=10000, batch_size=1024, iterations=100,
+                    block_size=65536, threads=1, seed=0, report=None):
+    """
+    Кластеризует строки vectors; возвращает центроиды, центр всего набора,
+    метки, косинусы до своего центроида и до центра набора
+    """
+    count = len(vectors)
+    rng = np.random.default_rng(seed)
+    sample = np.asarray(vectors[np.sort(rng.choice(count, size=min(count, sample_size), replace=False))],
+                        dtype=np.float32)
+    k = choose_k(sample, max_k, batch_size, iterations, seed)
+    if report:
+        report(40)
+
+    center = _normalize(sample.mean(axis=0, keepdims=True))
+    centroids = minibatch_kmeans(vectors, k, batch_size, iterations, seed) if k > 1 else center
+    if report:
+        report(70)
+
+    labels, best, _, to_center = assign(vectors, centroids, center, block_size, threads)
+    if report:
+        report(100)
+    return {
+        "centroids": centroids,
+        "center": center[0],
+        "labels": labels,
+        "similarities": best,
+        "center_similarities": to_center
+    }
+
+
+def _round_list(values):
+    return [round(float(value), 4) for value in values]
+
+
+def split_cluster(vectors_path, ids, options):
+    """Разбиение одного узла в процессе пула: кластеризация строк ids матрицы документов"""
+    vectors = np.load(vectors_path, mmap_mode='r')
+    return cluster_vectors(np.asarray(vectors[ids], dtype=np.float32), **options)
+
+
+def _make_node(node_id, name):
+    # Статистика заполняется сразу для всего дерева после построения
+    return {
+        "id": node_id,
+        "name": name,
+        "fileCount": 0,
+        "avgSimilarity": 0,
+        "similarityDistribution": [],
+        "files": [],
+        "children": []
+    }
+
+
+def _split_children(node, ids, split):
+    """
+    Дочерние узлы node по результату его разбиения: [(узел, номера документов
+    по убыванию близости к центроиду узла)] и номер дочернего узла для каждой метки
+    """
+    labels = split['labels']
+    counts = np.bincount(labels, minlength=len(split['centroids']))
+    order = np.lexsort((-split['similarities'], labels))
+    members = np.split(order, np.cumsum(counts)[:-1])
+
+    prefix = 'cluster' if node['id'] == 'root' else f"{node['id']}_"
+    children = []
+    child_of_label = np.full(len(counts), -1, dtype=np.int64)
+    for label in np.flatnonzero(counts):
+        child_of_label[label] = len(children)
+        child_id = f'{prefix}{len(children) + 1}'
+        name = 'Кластер ' + child_id[len('cluster'):].replace('_', '.')
+        children.append((_make_node(child_id, name), ids[members[label]]))
+    return children, child_of_label
+
+
+def save_centroids(path, nodes, centroids):
+    """Центроиды узлов дерева (.npz) для последующей классификации без повторной кластеризации"""
+    np.savez(path,
+             ids=np.array([node['id'] for node in nodes]),
+             names=np.array([node['name'] for node in nodes]),
+             leaves=np.array([not node['children'] for node in nodes]),
+             centroids=np.asarray(centroids, dtype=np.float32))
+
+
+def load_centroids(path):
+    with np.load(path) as data:
+        return {key: data[key] for key in data.files}
+
+
+def build_cluster_tree(vectors_path, file_names, max_k, max_depth, min_size, processes,
+                       sample_files=10, threads=1, report=None, centroids_path=None, **options):
+    """
+    Дивизивная иерархическая кластеризация: корень делится в текущем процессе
+    потоками, далее все узлы очередного уровня делятся независимо в пуле
+    процессов. Узел делится, пока глубина меньше max_depth и в нем не меньше
+    min_size документов. Листья содержат все свои файлы, внутренние узлы -
+    sample_files самых близких к центроиду. С centroids_path центроиды всех
+    узлов сохраняются через save_centroids
+    """
+    vectors = np.load(vectors_path, mmap_mode='r')
+    count = len(vectors)
+
+    def limit_k(size):
+        return min(max_k, max(2, size // min_size))
+
+    def report_root(progress):
+        if report:
+            report(progress * 0.4, level=0)
+
+    root_split = cluster_vectors(vectors, limit_k(count), threads=threads, report=report_root, **options)
+    root = _make_node('root', 'Все кластеры')
+    root_ids = np.argsort(-root_split['center_similarities'], kind='stable')
+    root['files'] = [{"name": file_names[j]} for j in root_ids[:sample_files]]
+
+    # Принадлежность документов узлам с косинусами из назначений кластеризации
+    nodes = [root]
+    centroids = [root_split['center']]
+    memberships = [np.zeros(count, dtype=np.int64)]
+    similarities = [root_split['center_similarities']]
+
+    level = [(root, root_ids, np.arange(count), root_split)]
+    pool = None
+    try:
+        for depth in range(1, max_depth + 1):
+            pending = []
+            for node, ordered_ids, ids, split in level:
+                children, child_of_label = _split_children(node, ids, split)
+                if len(children) < 2:
+                    # Узел не разделился и остается листом
+                    node['files'] = [{"name": file_names[j]} for j in ordered_ids]
+                    continue
+                memberships.append(child_of_label[split['labels']] + len(nodes))
+                similarities.append(split['similarities'])
+                nodes.extend(child for child, _ in children)
+                centroids.extend(split['centroids'][np.flatnonzero(child_of_label >= 0)])
+                node['children'] = [child for child, _ in children]
+                for child, child_ids in children:
+                    if depth < max_depth and len(child_ids) >= min_size:
+                        child['files'] = [{"name": file_names[j]} for j in child_ids[:sample_files]]
+                        pending.append((child, child_ids))
+                    else:
+                        child['files'] = [{"name": file_names[j]} for j in child_ids]
+            if report:
+                report(40 + 60 * depth / max_depth, level=depth, clusters_found=len(nodes))
+            if not pending:
+                break
+
+            if pool is None:
+                pool = ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context('spawn'))
+            sorted_ids = [np.sort(child_ids) for _, child_ids in pending]
+            splits = pool.map(split_cluster, itertools.repeat(vectors_path), sorted_ids,
+                              [dict(options, max_k=limit_k(len(ids))) for ids in sorted_ids])
+            level = [(child, child_ids, ids, split)
+                     for (child, child_ids), ids, split in zip(pending, sorted_ids, splits)]
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    counts, averages, distributions = node_stats(np.concatenate(memberships), np.concatenate(similarities),
+                                                 len(nodes))
+    for node, node_count, average, distribution in zip(nodes, counts.tolist(), averages, distributions):
+        node['fileCount'] = node_count
+        node['avgSimilarity'] = round(float(average), 4)
+        node['similarityDistribution'] = _round_list(distribution)
+    if centroids_path:
+        save_centroids(centroids_path, nodes, centroids)
+    if report:
+        report(100)
+    return root
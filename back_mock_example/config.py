@@ -0,0 +1,137 @@
+"""
+Конфигурация бэкенда
+Все настройки вынесены в один модуль и переопределяются переменными окружения
+"""
+import os
+
+
+def _env_int(name, default):
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+
+def _env_float(name, default):
+    value = os.environ.get(name)
+    return float(value) if value else default
+
+
+# Путь к общему хранилищу данных (монтируется в docker-compose)
+SHARED_DATA_PATH = os.environ.get('SHARED_DATA_PATH', '/shared_data')
+
+# Служебные данные бэкенда (задания, индексы, векторы) внутри общего хранилища
+BACKEND_DATA_PATH = os.environ.get('BACKEND_DATA_PATH', os.path.join(SHARED_DATA_PATH, '.backend'))
+
+# База данных заданий
+JOB_DB_PATH = os.environ.get('JOB_DB_PATH', os.path.join(BACKEND_DATA_PATH, 'jobs.db'))
+
+# Результаты завершенных заданий (JSON-файлы)
+JOB_RESULTS_PATH = os.path.join(BACKEND_DATA_PATH, 'results')
+
+# Время кэширования результата клиентом (сек.), результат завершенного задания не меняется
+RESULT_CACHE_MAX_AGE = _env_int('RESULT_CACHE_MAX_AGE', 86400)
+
+# Интервал служебных сообщений в потоке событий заданий (сек.) и предел ожидания ?wait=
+JOB_EVENTS_KEEPALIVE_SEC = _env_int('JOB_EVENTS_KEEPALIVE_SEC', 15)
+JOB_STATUS_MAX_WAIT_SEC = _env_int('JOB_STATUS_MAX_WAIT_SEC', 60)
+
+# Данные загруженных корпусов (векторы, индексы)
+CORPORA_PATH = os.path.join(BACKEND_DATA_PATH, 'corpora')
+
+# Количество процессов-обработчиков фоновых заданий
+CPU_COUNT = os.cpu_count() or 4
+JOB_WORKERS = _env_int('JOB_WORKERS', CPU_COUNT)
+
+# Ядра на одно задание: потоки и процессы внутри задания по умолчанию делят ядра между
+# обработчиками, чтобы одновременные задания не запускали CPU_COUNT² потоков
+JOB_CPUS = max(1, CPU_COUNT // JOB_WORKERS)
+
+# Максимальное количество заданий, ожидающих выполнения
+JOB_QUEUE_SIZE = _env_int('JOB_QUEUE_SIZE', 256)
+
+# Максимальное количество одновременно выполняемых заданий каждого типа
+JOB_TYPE_LIMITS = {
+    'upload': _env_int('JOB_LIMIT_UPLOAD', 2),
+    'clusterisation': _env_int('JOB_LIMIT_CLUSTERISATION', 2),
+    'classification': _env_int('JOB_LIMIT_CLASSIFICATION', 4),
+    'grnti_classification': _env_int('JOB_LIMIT_GRNTI_CLASSIFICATION', 4),
+    'fine_tuning': _env_int('JOB_LIMIT_FINE_TUNING', 1),
+}
+
+# Конвейер загрузки корпуса: потоки стадий, процессы нормализации, размеры очередей и пакетов
+INGEST_WALKERS = _env_int('INGEST_WALKERS', 4)
+INGEST_READERS = _env_int('INGEST_READERS', 4)
+INGEST_NORMALIZERS = _env_int('INGEST_NORMALIZERS', 2)
+INGEST_QUEUE_SIZE = _env_int('INGEST_QUEUE_SIZE', 1024)
+INGEST_BATCH_SIZE = _env_int('INGEST_BATCH_SIZE', 256)
+INGEST_CHUNK_SIZE = _env_int('INGEST_CHUNK_SIZE', 4 * 1024 * 1024)
+# Файлы не меньше этого размера читаются через mmap
+INGEST_MMAP_THRESHOLD = _env_int('INGEST_MMAP_THRESHOLD', 64 * 1024 * 1024)
+
+# Эмбеддинги: размер микропакета модели и ограничения пакетного запроса
+EMBEDDING_MICRO_BATCH_SIZE = _env_int('EMBEDDING_MICRO_BATCH_SIZE', 64)
+EMBEDDING_BATCH_MAX_TEXTS = _env_int('EMBEDDING_BATCH_MAX_TEXTS', 10000)
+EMBEDDING_BATCH_MAX_BYTES = _env_int('EMBEDDING_BATCH_MAX_BYTES', 64 * 1024 * 1024)
+
+# Тела text/plain (нормализация, эмбеддинг текста): предельный размер и блок потокового чтения (байт)
+TEXT_MAX_BYTES = _env_int('TEXT_MAX_BYTES', 10 * 1024 * 1024)
+TEXT_CHUNK_BYTES = _env_int('TEXT_CHUNK_BYTES', 64 * 1024)
+
+# Кэш нормальных форм слов (в каждом процессе) и необязательный TSV-словарь для его прогрева
+NORMALIZER_CACHE_SIZE = _env_int('NORMALIZER_CACHE_SIZE', 300000)
+NORMALIZER_DICTIONARY_PATH = os.environ.get('NORMALIZER_DICTIONARY_PATH')
+
+# Объединение одновременных запросов эмбеддингов: максимальный пакет и ожидание (мс)
+EMBEDDING_COALESCE_MAX_BATCH = _env_int('EMBEDDING_COALESCE_MAX_BATCH', 64)
+EMBEDDING_COALESCE_MAX_WAIT_MS = _env_int('EMBEDDING_COALESCE_MAX_WAIT_MS', 5)
+
+# Кэш эмбеддингов по хешу нормализованного текста: записей в памяти процесса, база на диске
+# и предельное число записей в ней (давно не использованные вытесняются)
+EMBEDDING_CACHE_SIZE = _env_int('EMBEDDING_CACHE_SIZE', 100000)
+EMBEDDING_CACHE_PATH = os.environ.get('EMBEDDING_CACHE_PATH', os.path.join(BACKEND_DATA_PATH, 'embeddings.db'))
+EMBEDDING_CACHE_DISK_SIZE = _env_int('EMBEDDING_CACHE_DISK_SIZE', 200000)
+
+# Ограничение памяти под загруженные модели (байт)
+MODEL_CACHE_MAX_BYTES = _env_int('MODEL_CACHE_MAX_BYTES', 4 * 1024 ** 3)
+
+# Тип хранения векторов корпуса на диске: float32 или float16
+VECTOR_DTYPE = os.environ.get('VECTOR_DTYPE', 'float32')
+
+# IVF-индекс поиска: число списков (0 - автоматически ~4*sqrt(N)) и число
+# просматриваемых списков по умолчанию (больше - выше полнота, дольше поиск)
+ANN_NLIST = _env_int('ANN_NLIST', 0)
+ANN_NPROBE = _env_int('ANN_NPROBE', 16)
+
+# Кластеризация: максимальное число кластеров (выбирается автоматически от 2),
+# размер выборки для выбора числа кластеров, мини-пакет и число итераций k-means,
+# потоки расчета расстояний
+CLUSTER_MAX_K = _env_int('CLUSTER_MAX_K', 20)
+CLUSTER_SAMPLE_SIZE = _env_int('CLUSTER_SAMPLE_SIZE', 10000)
+CLUSTER_BATCH_SIZE = _env_int('CLUSTER_BATCH_SIZE', 1024)
+CLUSTER_ITERATIONS = _env_int('CLUSTER_ITERATIONS', 100)
+CLUSTER_THREADS = _env_int('CLUSTER_THREADS', JOB_CPUS)
+
+# Иерархия кластеров: максимальная глубина, минимальный размер делимого кластера,
+# процессы для параллельного деления поддеревьев
+CLUSTER_MAX_DEPTH = _env_int('CLUSTER_MAX_DEPTH', 3)
+CLUSTER_MIN_SIZE = _env_int('CLUSTER_MIN_SIZE', 20)
+CLUSTER_PROCESSES = _env_int('CLUSTER_PROCESSES', JOB_CPUS)
+
+# Число ближайших кластеров документа в таблице соответствия классификации
+CLASSIFICATION_TOP_K = _env_int('CLASSIFICATION_TOP_K', 5)
+
+# Классификация по ГРНТИ: JSON-файл рубрикатора [{"code", "name"}] (по умолчанию
+# встроенная ветвь "военное дело"), кэш эмбеддингов рубрик, число рубрик уровня,
+# потомки которых рассматриваются дальше, порог косинуса для спуска на уровень ниже
+# и уровень, до которого документ опускается независимо от порога
+GRNTI_RUBRICS_PATH = os.environ.get('GRNTI_RUBRICS_PATH')
+GRNTI_CACHE_PATH = os.path.join(BACKEND_DATA_PATH, 'grnti')
+GRNTI_BEAM = _env_int('GRNTI_BEAM', 3)
+GRNTI_MIN_SIMILARITY = _env_float('GRNTI_MIN_SIMILARITY', 0.3)
+GRNTI_MIN_LEVEL = _env_int('GRNTI_MIN_LEVEL', 2)
+GRNTI_THREADS = _env_int('GRNTI_THREADS', JOB_CPUS)
+
+# Количество корпусов, индексы которых держатся открытыми для поиска
+SEARCH_CACHE_SIZE = _env_int('SEARCH_CACHE_SIZE', 8)
+
+# Количество кэшируемых отчетов оценки классификации
+EVALUATION_CACHE_SIZE = _env_int('EVALUATION_CACHE_SIZE', 64)
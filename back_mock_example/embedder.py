@@ -0,0 +1,53 @@
+"""
+Мок-модель эмбеддингов
+Детерминированное хеширование слов в пространство размерности модели:
+одинаковые тексты дают одинаковые векторы во всех процессах
+"""
+import re
+import zlib
+
+import numpy as np
+
+_WORD_RE = re.compile(r'\w+')
+
+# Условный размер словаря мок-модели, определяет ее объем в памяти
+MOCK_VOCAB_SIZE = 250000
+
+
+def embed_texts(texts, dimension, seed=0):
+    """Эмбеддинги пакета текстов, матрица float32 (len(texts), dimension) с единичными строками"""
+    rows, cols, signs = [], [], []
+    for row, text in enumerate(texts):
+        for word in _WORD_RE.findall(text.lower()):
+            h = zlib.crc32(word.encode('utf-8'), seed)
+            rows.append(row)
+            cols.append(h % dimension)
+            signs.append(1.0 if h & 0x80000000 else -1.0)
+
+    vectors = np.zeros((len(texts), dimension), dtype=np.float32)
+    np.add.at(vectors, (np.array(rows, dtype=np.intp), np.array(cols, dtype=np.intp)),
+              np.array(signs, dtype=np.float32))
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    np.divide(vectors, norms, out=vectors, where=norms > 0)
+    return vectors
+
+
+def embed_in_batches(texts, dimension, batch_size, seed=0):
+    """Эмбеддинги произвольного числа текстов, модель вызывается микропакетами по batch_size"""
+    vectors = np.empty((len(texts), dimension), dtype=np.float32)
+    for start in range(0, len(texts), batch_size):
+        vectors[start:start + batch_size] = embed_texts(texts[start:start + batch_size], dimension, seed)
+    return vectors
+
+
+class HashingModel:
+    """Загруженная мок-модель; дообученные модели отличаются зерном хеширования"""
+
+    def __init__(self, model_id, dimension, seed=0):
+        self.model_id = model_id
+        self.dimension = dimension
+        self.seed = seed
+        self.memory_bytes = MOCK_VOCAB_SIZE * dimension * 4
+
+    def embed(self, texts, batch_size):
+        return embed_in_batches(texts, self.dimension, batch_size, self.seed)
@@ -0,0 +1,178 @@
+"""
+Кэш эмбеддингов по содержимому текста
+Ключ - модель и хеш нормализованного текста. Первый уровень - LRU в памяти
+процесса, второй - таблица SQLite в общем хранилище, общая для сервера и
+процессов-обработчиков: неизменившиеся абзацы при повторной загрузке корпуса
+и повторные поисковые запросы не отправляются в модель. Таблица ограничена
+по числу записей: сверх предела удаляются записи, дольше всех не использованные
+"""
+import collections
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS embeddings (
+    model_id    TEXT NOT NULL,
+    hash        BLOB NOT NULL,
+    vector      BLOB NOT NULL,
+    used_at     INTEGER NOT NULL,
+    PRIMARY KEY (model_id, hash)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS embeddings_used_at ON embeddings (used_at);
+"""
+
+# Ограничение SQLite на число параметров запроса (с запасом под model_id)
+_MAX_SQL_PARAMS = 900
+
+# Время использования записи обновляется не чаще, чем раз в столько секунд
+_TOUCH_INTERVAL = 3600
+
+
+def text_hash(text):
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).digest()
+
+
+class EmbeddingCache:
+    """Двухуровневый кэш эмбеддингов (одно соединение SQLite на поток)"""
+
+    def __init__(self, path, size, disk_size):
+        self.path = path
+        self.size = size
+        self.disk_size = disk_size
+        self._memory = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._stored = 0
+        self.memory_hits = self.disk_hits = self.misses = 0
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with self._connect() as conn:
+            columns = [row[1] for row in conn.execute('PRAGMA table_info(embeddings)')]
+            if columns and 'used_at' not in columns:
+                # Таблица прежнего формата без времени использования: кэш собирается заново
+                conn.execute('DROP TABLE embeddings')
+            conn.executescript(_SCHEMA)
+        self._evict()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _remember(self, items):
+        with self._lock:
+            for key, vector in items:
+                self._memory[key] = vector
+                self._memory.move_to_end(key)
+            while len(self._memory) > self.size:
+                self._memory.popitem(last=False)
+
+    def _load(self, model_id, hashes, dimension):
+        """Векторы из таблицы для хешей hashes: hash -> вектор; найденные отмечаются использованными"""
+        found = {}
+        stale = []
+        now = int(time.time())
+        conn = self._connect()
+        for start in range(0, len(hashes), _MAX_SQL_PARAMS):
+            chunk = hashes[start:start + _MAX_SQL_PARAMS]
+            rows = conn.execute(
+                f'SELECT hash, vector, used_at FROM embeddings '
+                f'WHERE model_id = ? AND hash IN ({",".join("?" * len(chunk))})',
+                (model_id, *chunk)
+            )
+            for digest, blob, used_at in rows:
+                vector = np.frombuffer(blob, dtype=np.float32)
+                if len(vector) == dimension:
+                    found[digest] = vector
+                    if used_at < now - _TOUCH_INTERVAL:
+                        stale.append(digest)
+        if stale:
+            with conn:
+                conn.executemany('UPDATE embeddings SET used_at = ? WHERE model_id = ? AND hash = ?',
+                                 ((now, model_id, digest) for digest in stale))
+        return found
+
+    def _store(self, model_id, hashes, vectors):
+        now = int(time.time())
+        with self._connect() as conn:
+            conn.executemany(
+                'INSERT OR IGNORE INTO embeddings (model_id, hash, vector, used_at) VALUES (?, ?, ?, ?)',
+                ((model_id, digest, vector.tobytes(), now) for digest, vector in zip(hashes, vectors))
+            )
+        # Таблица подрезается после каждых ~5% предела новых записей этого процесса
+        with self._lock:
+            self._stored += len(hashes)
+            evict = self._stored >= max(1, self.disk_size // 20)
+            if evict:
+                self._stored = 0
+        if evict:
+            self._evict()
+
+    def _evict(self):
+        """Удаляет из таблицы записи сверх disk_size, начиная с давно не использованных"""
+        with self._connect() as conn:
+            # Индекс по used_at содержит и первичный ключ, он же разрешает равные времена
+            conn.execute(
+                'DELETE FROM embeddings WHERE (used_at, model_id, hash) <= '
+                '(SELECT used_at, model_id, hash FROM embeddings '
+                'ORDER BY used_at DESC, model_id DESC, hash DESC LIMIT 1 OFFSET ?)',
+                (self.disk_size,)
+            )
+
+    def embed(self, model_id, dimension, texts, compute):
+        """
+        Матрица эмбеддингов texts; compute(texts) -> матрица вызывается только
+        для текстов, которых нет ни в памяти, ни в таблице (повторы - один раз)
+        """
+        hashes = [text_hash(text) for text in texts]
+        vectors = np.empty((len(texts), dimension), dtype=np.float32)
+        missing = {}
+        with self._lock:
+            for i, digest in enumerate(hashes):
+                vector = self._memory.get((model_id, digest))
+                if vector is None:
+                    missing.setdefault(digest, []).append(i)
+                else:
+                    self._memory.move_to_end((model_id, digest))
+                    vectors[i] = vector
+            self.memory_hits += len(texts) - sum(map(len, missing.values()))
+
+        if missing:
+            found = self._load(model_id, list(missing), dimension)
+            found_rows = 0
+            for digest, vector in found.items():
+                rows = missing.pop(digest)
+                vectors[rows] = vector
+                found_rows += len(rows)
+            self._remember(((model_id, digest), vector) for digest, vector in found.items())
+            with self._lock:
+                self.disk_hits += found_rows
+                self.misses += sum(map(len, missing.values()))
+
+        if missing:
+            computed = np.asarray(compute([texts[rows[0]] for rows in missing.values()]), dtype=np.float32)
+            for rows, vector in zip(missing.values(), computed):
+                vectors[rows] = vector
+            self._store(model_id, list(missing), computed)
+            # Копии строк, чтобы кэш не удерживал всю матрицу пакета
+            self._remember(((model_id, digest), vector.copy()) for digest, vector in zip(missing, computed))
+        return vectors
+
+    def info(self):
+        with self._lock:
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "memory_size": len(self._memory),
+                "memory_max_size": self.size,
+                "disk_max_size": self.disk_size
+            }
@@ -0,0 +1,181 @@
+"""
+Оценка качества классификации (precision, recall, F1)
+Метки кодируются целыми числами, предсказания всех файлов укладываются в одну
+матрицу, и TP/FP/FN по файлам и в целом считаются одним векторизованным проходом
+"""
+import collections
+import threading
+
+import numpy as np
+
+from mock_data import MOCK_CLUSTER_EXPERT_MAPPING
+
+
+def extract_predictions(classification_result, eval_type, ground_truth=None):
+    """
+    Файлы, экспертные метки и предсказания системы из результата классификации
+    ground_truth - экспертная разметка из запроса (файл -> код кластера или
+    рубрики); без нее используются метки из результата (grnti) или
+    демонстрационная разметка кластеров. Файлы без метки не оцениваются
+    """
+    if eval_type == 'grnti':
+        rows = [(row['file'], row['expert_grnti_code'], row['top_5_predictions'])
+                for row in classification_result['files']]
+    else:
+        rows = [(row['f'], MOCK_CLUSTER_EXPERT_MAPPING.get(row['f']), row['d'])
+                for row in classification_result['correspondence_table']['files']]
+    if ground_truth is not None:
+        rows = [(file, ground_truth.get(file), predictions) for file, _, predictions in rows]
+    rows = [row for row in rows if row[1] is not None]
+    return [row[0] for row in rows], [row[1] for row in rows], [row[2] for row in rows]
+
+
+def score(expert_labels, predictions):
+    """
+    TP/FP/FN и метрики по каждому файлу, TP/FP и поддержка по каждому классу
+    Повторяющиеся предсказанные классы в пределах файла считаются один раз
+    """
+    n = len(expert_labels)
+    width = max((len(p) for p in predictions), default=0)
+    vocabulary = {}
+    expert = np.fromiter((vocabulary.setdefault(label, len(vocabulary)) for label in expert_labels),
+                         dtype=np.int64, count=n)
+    predicted = np.full((n, max(width, 1)), -1, dtype=np.int64)
+    for i, file_predictions in enumerate(predictions):
+        predicted[i, :len(file_predictions)] = [vocabulary.setdefault(p[0], len(vocabulary))
+                                                for p in file_predictions]
+
+    # Дубликаты внутри строки: после сортировки равные соседние значения
+    predicted.sort(axis=1)
+    duplicate = np.zeros_like(predicted, dtype=bool)
+    duplicate[:, 1:] = predicted[:, 1:] == predicted[:, :-1]
+    valid = (predicted >= 0) & ~duplicate
+    hits = (predicted == expert[:, None]) & valid
+
+    tp = hits.any(axis=1).astype(np.int64)
+    fp = valid.sum(axis=1) - tp
+    fn = 1 - tp
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        precision = np.where(tp + fp > 0, tp / (tp + fp), 0.0)
+        recall = np.where(tp + fn > 0, tp / (tp + fn), 0.0)
+        f1 = np.where(precision + recall > 0, 2 * precision * recall / (precision + recall), 0.0)
+
+    # Класс c: TP - файлы класса c, где c предсказан; FP - остальные файлы, где c предсказан;
+    # поддержка - число файлов класса c по экспертной разметке
+    classes = len(vocabulary)
+    class_tp = np.bincount(predicted[hits], minlength=classes)
+    class_fp = np.bincount(predicted[valid], minlength=classes) - class_tp
+    support = np.bincount(expert, minlength=classes)
+
+    return {"tp": tp, "fp": fp, "fn": fn, "precision": precision, "recall": recall, "f1": f1,
+            "labels": list(vocabulary), "class_tp": class_tp, "class_fp": class_fp, "support": support}
+
+
+def _ratio(numerator, denominator):
+    return numerator / denominator if denominator > 0 else 0.0
+
+
+class Evaluation:
+    """
+    Результат оценки: агрегированный отчет с precision и recall (общими и по
+    классам) и ленивая выдача метрик по файлам; один объект обслуживает обе метрики
+    """
+
+    def __init__(self, files, expert_labels, predictions, scores):
+        self._files = files
+        self._expert_labels = expert_labels
+        self._predictions = predictions
+        self._scores = scores
+        self.total_files = len(files)
+
+        total_tp = int(scores['tp'].sum())
+        total_fp = int(scores['fp'].sum())
+        total_fn = int(scores['fn'].sum())
+        precision = _ratio(total_tp, total_tp + total_fp)
+        recall = _ratio(total_tp, total_tp + total_fn)
+        f1 = _ratio(2 * precision * recall, precision + recall)
+
+        per_class = []
+        for label, tp, fp, support in zip(scores['labels'], scores['class_tp'].tolist(),
+                                          scores['class_fp'].tolist(), scores['support'].tolist()):
+            per_class.append({
+                "label": label,
+                "precision": round(_ratio(tp, tp + fp), 4),
+                "recall": round(_ratio(tp, support), 4),
+                "support": support
+            })
+
+        self.report = {
+            "metrics": {
+                "total_files": len(files),
+                "total_tp": total_tp,
+                "total_fp": total_fp,
+                "total_fn": total_fn,
+                "precision": round(precision, 4),
+                "recall": round(recall, 4),
+                "f1": round(f1, 4)
+            },
+            "summary": {
+                "files_with_matches": total_tp,
+                "files_without_matches": len(files) - total_tp,
+                "average_precision": round(precision, 4),
+                "average_recall": round(recall, 4)
+            },
+            "per_class": per_class
+        }
+
+    def file_metrics(self, start=0, stop=None):
+        """Метрики файлов с номерами [start, stop) в формате API"""
+        window = slice(start, stop)
+        scores = self._scores
+        per_file = zip(self._files[window], self._expert_labels[window], self._predictions[window],
+                       scores['tp'][window].tolist(), scores['fp'][window].tolist(),
+                       scores['fn'][window].tolist(), scores['precision'][window].tolist(),
+                       scores['recall'][window].tolist())
+        for file, expert_label, system_predictions, tp, fp, fn, precision, recall in per_file:
+            yield {
+                "file": file,
+                "expert_label": expert_label,
+                "system_predictions": system_predictions,
+                "tp": tp,
+                "fp": fp,
+                "fn": fn,
+                "precision": precision,
+                "recall": recall,
+                "match_found": tp > 0
+            }
+
+
+def evaluate_classification(classification_result, eval_type, ground_truth=None):
+    """Оценка результата классификации: precision и recall считаются вместе"""
+    files, expert_labels, predictions = extract_predictions(classification_result, eval_type, ground_truth)
+    return Evaluation(files, expert_labels, predictions, score(expert_labels, predictions))
+
+
+class EvaluationCache:
+    """LRU готовых отчетов оценки, ключ включает версию результата задания"""
+
+    def __init__(self, size):
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._items = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.size:
+                self._items.popitem(last=False)
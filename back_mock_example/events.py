@@ -0,0 +1,55 @@
+"""
+Уведомления об изменении заданий для подписчиков (Server-Sent Events)
+Подписчик получает не сами события, а множество изменившихся job_id:
+повторные обновления одного задания схлопываются, память ограничена числом
+заданий, а последнее состояние (в том числе завершение) никогда не теряется
+"""
+import threading
+
+
+class Subscription:
+    """Изменившиеся задания одного подписчика (всех или одного job_id)"""
+
+    def __init__(self, job_id=None):
+        self.job_id = job_id
+        self._changed = set()
+        self._cond = threading.Condition()
+
+    def notify(self, job_id):
+        if self.job_id is not None and job_id != self.job_id:
+            return
+        with self._cond:
+            self._changed.add(job_id)
+            self._cond.notify()
+
+    def wait(self, timeout):
+        """Изменившиеся job_id или пустое множество по истечении timeout"""
+        with self._cond:
+            if not self._changed:
+                self._cond.wait(timeout)
+            changed, self._changed = self._changed, set()
+            return changed
+
+
+class JobEvents:
+    """Раздает уведомления об изменении заданий подписчикам"""
+
+    def __init__(self):
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self, job_id=None):
+        subscription = Subscription(job_id)
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def publish(self, job_id):
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            subscription.notify(job_id)
@@ -0,0 +1,263 @@
+"""
+Классификация документов по рубрикатору ГРНТИ
+Эмбеддинги названий рубрик считаются один раз для модели и кэшируются в
+памяти и на диске. Поиск идет сверху вниз: на каждом уровне документ
+сравнивается только с потомками beam лучших рубрик предыдущего уровня,
+предсказание опускается до уровня min_level безусловно и дальше, пока лучшая
+рубрика уровня достаточно близка. Документ, остановившийся на рубрике с
+потомком "общие вопросы" (XX.YY.00), относится к этому потомку
+"""
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# Число рубрик в top_5_predictions
+TOP_PREDICTIONS = 5
+
+# Эмбеддинги рубрик, уже загруженные в этом процессе: (model_id, версия рубрикатора) -> матрица
+_rubric_vectors = {}
+
+
+def load_rubrics(path, default):
+    """Рубрики [{"code", "name"}] из JSON-файла path или default, если файла нет"""
+    if path and os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    return default
+
+
+def _parent_code(code):
+    return code.rsplit('.', 1)[0] if '.' in code else None
+
+
+class RubricTree:
+    """Рубрикатор в виде массивов: уровни, родители и таблица потомков"""
+
+    def __init__(self, rubrics):
+        rubrics = sorted(rubrics, key=lambda rubric: rubric['code'])
+        self.codes = [rubric['code'] for rubric in rubrics]
+        self.names = [rubric['name'] for rubric in rubrics]
+        index = {code: i for i, code in enumerate(self.codes)}
+        self.levels = np.array([code.count('.') + 1 for code in self.codes], dtype=np.int64)
+        parents = [index.get(_parent_code(code), -1) for code in self.codes]
+        self.parents = np.array(parents, dtype=np.int64)
+        self.roots = np.array([i for i, parent in enumerate(parents) if parent < 0], dtype=np.int64)
+        self.index = index
+
+        # Предки рубрики i от родителя к корню, дополненные -1 до глубины рубрикатора
+        depth = int(self.levels.max()) if len(self.codes) else 1
+        self.ancestors = np.full((len(self.codes), max(depth - 1, 1)), -1, dtype=np.int64)
+        for i, parent in enumerate(parents):
+            level = 0
+            while parent >= 0:
+                self.ancestors[i, level] = parent
+                parent = parents[parent]
+                level += 1
+
+        # Потомки рубрики i - строка i, дополненная -1 до ширины самой большой рубрики
+        children = [[] for _ in self.codes]
+        for i, parent in enumerate(parents):
+            if parent >= 0:
+                children[parent].append(i)
+        width = max((len(row) for row in children), default=0)
+        self.children = np.full((len(self.codes), max(width, 1)), -1, dtype=np.int64)
+        for i, row in enumerate(children):
+            self.children[i, :len(row)] = row
+
+        # Потомок "общие вопросы" (<код>.00) каждой рубрики или -1
+        self.general = np.array([index.get(code + '.00', -1) for code in self.codes], dtype=np.int64)
+
+        self.version = hashlib.sha1(
+            json.dumps([self.codes, self.names], ensure_ascii=False).encode('utf-8')).hexdigest()[:12]
+
+
+def rubric_vectors(tree, model, cache_path, embed):
+    """Нормированные эмбеддинги названий рубрик для модели; embed(texts) -> матрица"""
+    key = (model.model_id, tree.version)
+    vectors = _rubric_vectors.get(key)
+    if vectors is not None:
+        return vectors
+
+    path = os.path.join(cache_path, f'{model.model_id}-{tree.version}.npy')
+    if os.path.exists(path):
+        vectors = np.load(path)
+    else:
+        vectors = np.asarray(embed(tree.names), dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.maximum(norms, 1e-12)
+        os.makedirs(cache_path, exist_ok=True)
+        with open(path + '.tmp', 'wb') as f:
+            np.save(f, vectors)
+        os.replace(path + '.tmp', path)
+    _rubric_vectors[key] = vectors
+    return vectors
+
+
+def _classify_block(block, tree, vectors, beam, min_similarity, min_level):
+    """Предсказанная рубрика, ее косинус и top-k среди всех оцененных рубрик для блока документов"""
+    count = len(block)
+    rows = np.arange(count)
+    predicted = np.full(count, -1, dtype=np.int64)
+    similarity = np.zeros(count, dtype=np.float32)
+    active = np.ones(count, dtype=bool)
+    scored, scored_candidates = [], []
+
+    candidates = np.broadcast_to(tree.roots, (count, len(tree.roots)))
+    level = 1
+    while candidates.shape[1] and active.any():
+        valid = (candidates >= 0) & active[:, None]
+        safe = np.where(valid, candidates, 0)
+        scores = np.einsum('nd,ncd->nc', block, vectors[safe])
+        scores[~valid] = -np.inf
+        scored.append(scores)
+        scored_candidates.append(safe)
+
+        # До min_level документ опускается всегда, ниже - если лучшая рубрика уровня не ниже порога
+        best = np.argmax(scores, axis=1)
+        best_score = scores[rows, best]
+        descend = valid.any(axis=1) & ((best_score >= min_similarity) | (level <= min_level))
+        predicted[descend] = safe[rows, best][descend]
+        similarity[descend] = best_score[descend]
+        active &= descend
+        level += 1
+
+        # Кандидаты следующего уровня - потомки beam лучших рубрик
+        order = np.argsort(-scores, axis=1)[:, :beam]
+        frontier = np.where(np.isfinite(scores[rows[:, None], order]), safe[rows[:, None], order], -1)
+        candidates = np.where(frontier[:, :, None] >= 0, tree.children[np.maximum(frontier, 0)], -1)
+        candidates = candidates.reshape(count, -1)
+        candidates = candidates[:, (candidates >= 0).any(axis=0)]
+
+    # Остановившийся на рубрике с потомком XX.YY.00 документ относится к нему
+    general = np.where(predicted >= 0, tree.general[np.maximum(predicted, 0)], -1)
+    fallback = general >= 0
+    if fallback.any():
+        predicted[fallback] = general[fallback]
+        similarity[fallback] = np.einsum('nd,nd->n', block[fallback], vectors[general[fallback]])
+
+    # top-k: предсказанная рубрика, затем лучшие из остальных рубрик, с которыми документ
+    # сравнивался. Рубрики, потомки которых тоже оценены, и предки предсказанной рубрики
+    # пропускаются: их место занимают более точные рубрики
+    top = np.full((count, TOP_PREDICTIONS), -1, dtype=np.int64)
+    top_scores = np.zeros((count, TOP_PREDICTIONS), dtype=np.float32)
+    top[:, 0] = predicted
+    top_scores[:, 0] = similarity
+    if scored:
+        candidates = np.concatenate(scored_candidates, axis=1)
+        scores = np.concatenate(scored, axis=1)
+        parents = np.where(np.isfinite(scores), tree.parents[candidates], -1)
+        expanded = (candidates[:, :, None] == parents[:, None, :]).any(axis=2)
+        predicted_ancestors = np.where(predicted[:, None] >= 0, tree.ancestors[np.maximum(predicted, 0)], -1)
+        ancestor = (candidates[:, :, None] == predicted_ancestors[:, None, :]).any(axis=2)
+        scores = np.where((candidates == predicted[:, None]) | expanded | ancestor, -np.inf, scores)
+        width = min(TOP_PREDICTIONS - 1, scores.shape[1])
+        order = np.argsort(-scores, axis=1)[:, :width]
+        best_scores = scores[rows[:, None], order]
+        found = np.isfinite(best_scores)
+        top[:, 1:width + 1] = np.where(found, candidates[rows[:, None], order], -1)
+        top_scores[:, 1:width + 1] = np.where(found, best_scores, 0)
+    return predicted, similarity, top, top_scores
+
+
+def _ratio(numerator, denominator):
+    return round(numerator / denominator, 4) if denominator > 0 else None
+
+
+def classify_documents(vectors, file_names, tree, rubric_matrix, beam, min_similarity, min_level=2,
+                       block_size=256, threads=1, expert_codes=None):
+    """
+    Рубрики ГРНТИ для документов; блоки документов обрабатываются в пуле потоков
+    expert_codes - экспертные рубрики файлов (код или None) в порядке file_names;
+    по ним считаются совпадение с экспертом, точность top-3 и статистика рубрик,
+    без экспертной разметки эти показатели равны None
+    """
+    count = len(vectors)
+    predicted = np.empty(count, dtype=np.int64)
+    similarity = np.empty(count, dtype=np.float32)
+    top = np.empty((count, TOP_PREDICTIONS), dtype=np.int64)
+    top_scores = np.empty((count, TOP_PREDICTIONS), dtype=np.float32)
+
+    def classify_block(start):
+        block = np.asarray(vectors[start:start + block_size], dtype=np.float32)
+        end = start + len(block)
+        predicted[start:end], similarity[start:end], top[start:end], top_scores[start:end] = \
+            _classify_block(block, tree, rubric_matrix, beam, min_similarity, min_level)
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(classify_block, range(0, count, block_size)))
+
+    if expert_codes is None:
+        expert_codes = [None] * count
+    files = []
+    for j in range(count):
+        code = predicted[j]
+        expert_code = expert_codes[j]
+        expert = tree.index.get(expert_code, -1)
+        files.append({
+            "file": file_names[j],
+            "expert_grnti_code": expert_code,
+            "expert_grnti_name": tree.names[expert] if expert >= 0 else None,
+            "predicted_grnti_code": tree.codes[code] if code >= 0 else None,
+            "predicted_grnti_name": tree.names[code] if code >= 0 else None,
+            "predicted_level": int(tree.levels[code]) if code >= 0 else 0,
+            "similarity": round(float(similarity[j]), 4),
+            "top_5_predictions": [[tree.codes[i], round(float(score), 4)]
+                                  for i, score in zip(top[j], top_scores[j]) if i >= 0]
+        })
+
+    # Экспертные рубрики кодируются номерами рубрикатора, рубрики вне его - номерами после них
+    labeled = np.array([code is not None for code in expert_codes], dtype=bool)
+    vocabulary = dict(tree.index)
+    expert = np.array([vocabulary.setdefault(code, len(vocabulary)) if code is not None else -1
+                       for code in expert_codes], dtype=np.int64)
+    codes = list(vocabulary)
+    system_counts = np.bincount(predicted[predicted >= 0], minlength=len(codes))
+    summary = {
+        "total_files": count,
+        "files_classified": int((predicted >= 0).sum()),
+        "files_with_expert": int(labeled.sum()),
+        "agreement_with_expert": _ratio(int((predicted[labeled] == expert[labeled]).sum()), int(labeled.sum())),
+        "accuracy_top_3": _ratio(int((top[labeled, :3] == expert[labeled, None]).any(axis=1).sum()),
+                                 int(labeled.sum()))
+    }
+
+    detailed_stats = {}
+    if labeled.any():
+        # Статистика рубрик по размеченным файлам: совпадение предсказанной рубрики с экспертной
+        hit = labeled & (predicted == expert)
+        expert_counts = np.bincount(expert[labeled], minlength=len(codes))
+        labeled_counts = np.bincount(predicted[labeled & (predicted >= 0)], minlength=len(codes))
+        true_positive = np.bincount(expert[hit], minlength=len(codes))
+        for i in np.flatnonzero(system_counts + expert_counts):
+            tp = int(true_positive[i])
+            fp = int(labeled_counts[i]) - tp
+            fn = int(expert_counts[i]) - tp
+            detailed_stats[codes[i]] = {
+                "code": codes[i],
+                "name": tree.names[i] if i < len(tree.codes) else None,
+                "expert_count": int(expert_counts[i]),
+                "system_count": int(system_counts[i]),
+                "true_positive": tp,
+                "false_positive": fp,
+                "false_negative": fn,
+                "precision": _ratio(tp, tp + fp),
+                "recall": _ratio(tp, tp + fn)
+            }
+    else:
+        for i in np.flatnonzero(system_counts):
+            detailed_stats[codes[i]] = {
+                "code": codes[i],
+                "name": tree.names[i],
+                "system_count": int(system_counts[i])
+            }
+
+    return {
+        "classification_results": {
+            "summary": summary,
+            "detailed_stats": detailed_stats
+        },
+        "files": files
+    }
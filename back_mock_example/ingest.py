@@ -0,0 +1,320 @@
+"""
+Потоковый конвейер загрузки корпуса
+Обход каталога -> чтение файлов и разбиение на абзацы с проверкой UTF-8 ->
+нормализация -> пакетное построение эмбеддингов. Стадии работают в своих
+потоках и соединены ограниченными очередями, поэтому корпус целиком
+в памяти никогда не находится. Нормализация упирается в процессор и
+выполняется пакетами абзацев в отдельных процессах
+"""
+import hashlib
+import mmap
+import multiprocessing
+import os
+import queue
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+# Маркер завершения стадии
+_DONE = object()
+
+# Граница абзаца: пустая строка (байт \n не встречается внутри многобайтовых символов UTF-8)
+_PARAGRAPH_BREAK_RE = re.compile(rb'\r?\n[ \t]*\r?\n')
+
+
+class _Pipeline:
+    """Общее состояние стадий: флаг остановки, первая ошибка и счетчики"""
+
+    def __init__(self):
+        self.stop = threading.Event()
+        self.error = None
+        self.lock = threading.Lock()
+        self.bytes_discovered = 0
+        self.walk_done = False
+        self.bytes_processed = 0
+        self.files_processed = 0
+        self.invalid_files = 0
+        # Некорректные файлы, часть абзацев которых уже ушла дальше по конвейеру
+        self.discarded = set()
+        self.paragraphs = 0
+        self.manifest = {}
+
+    def put(self, q, item):
+        while not self.stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def get(self, q):
+        while not self.stop.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        return _DONE
+
+    def fail(self, error):
+        with self.lock:
+            if self.error is None:
+                self.error = error
+        self.stop.set()
+
+    def run_stage(self, target, workers, out_q, consumers):
+        """Запускает стадию в workers потоках; по завершении отправляет маркеры следующей стадии"""
+        def guarded():
+            try:
+                target()
+            except Exception as e:
+                self.fail(e)
+
+        threads = [threading.Thread(target=guarded, daemon=True) for _ in range(workers)]
+        for t in threads:
+            t.start()
+
+        def close():
+            for t in threads:
+                t.join()
+            for _ in range(consumers):
+                self.put(out_q, _DONE)
+
+        threading.Thread(target=close, daemon=True).start()
+
+
+def _split_paragraphs(data, start, limit):
+    """Разбивает байты на абзацы; возвращает [(смещение, байты)] и необработанный хвост"""
+    paragraphs = []
+    pos = 0
+    for m in _PARAGRAPH_BREAK_RE.finditer(data):
+        if m.start() > pos:
+            paragraphs.append((start + pos, data[pos:m.start()]))
+        pos = m.end()
+    tail = data[pos:]
+
+    # Слишком длинный абзац режется по последнему переводу строки или границе символа
+    while len(tail) > limit:
+        cut = tail.rfind(b'\n', 0, limit)
+        if cut <= 0:
+            cut = limit
+            while cut > 0 and tail[cut] & 0xC0 == 0x80:
+                cut -= 1
+        paragraphs.append((start + pos, tail[:cut]))
+        pos += cut
+        tail = tail[cut:]
+    return paragraphs, start + pos, tail
+
+
+def _iter_chunks(path, size, chunk_size, mmap_threshold):
+    """Читает файл блоками; большие файлы отображаются в память"""
+    with open(path, 'rb') as f:
+        if size >= mmap_threshold:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                for offset in range(0, len(mm), chunk_size):
+                    yield mm[offset:offset + chunk_size]
+        else:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+
+
+def _decode_paragraphs(path, size, chunk_size, mmap_threshold, max_paragraph_bytes, digest=None):
+    start, tail = 0, b''
+    for chunk in _iter_chunks(path, size, chunk_size, mmap_threshold):
+        if digest is not None:
+            digest.update(chunk)
+        paragraphs, start, tail = _split_paragraphs(tail + chunk, start, max_paragraph_bytes)
+        for offset, raw in paragraphs:
+            yield offset, len(raw), raw.decode('utf-8')
+    if tail.strip():
+        yield start, len(tail), tail.decode('utf-8')
+
+
+def iter_file_paragraphs(path, size, chunk_size, mmap_threshold, max_paragraph_bytes, digest=None):
+    """
+    Абзацы файла в виде (байтовое смещение, длина в байтах, текст)
+    UTF-8 проверяется при разборе, файл читается один раз. Файл в один блок
+    разбирается целиком в памяти и при некорректном UTF-8 не дает ни одного
+    абзаца; больший выдает абзацы по мере чтения, и UnicodeDecodeError может
+    последовать за первыми из них - их отбрасывает вызывающий
+    digest (объект hashlib) получает прочитанные байты
+    """
+    if size > chunk_size:
+        yield from _decode_paragraphs(path, size, chunk_size, mmap_threshold, max_paragraph_bytes, digest)
+    else:
+        yield from list(_decode_paragraphs(path, size, chunk_size, mmap_threshold, max_paragraph_bytes, digest))
+
+
+def _normalize_batch(normalize, texts):
+    return [normalize(text) for text in texts]
+
+
+def ingest_corpus(root, embed, sink, report, *, walkers=4, readers=4, normalizers=2,
+                  batch_size=256, queue_size=1024, chunk_size=4 * 1024 * 1024,
+                  mmap_threshold=64 * 1024 * 1024, max_paragraph_bytes=64 * 1024,
+                  normalize=str.strip, normalize_initializer=None, normalize_initargs=(), files=None,
+                  discard=None):
+    """
+    Прогоняет корпус .txt файлов через конвейер
+    embed(texts) -> матрица эмбеддингов, sink(records, vectors) получает пакеты,
+    где records - список (file_id, байтовое смещение, длина в байтах)
+    normalize выполняется в normalizers процессах, каждый из которых
+    при запуске вызывает normalize_initializer(*normalize_initargs)
+    С files - списком (путь, размер, mtime в нс) - обрабатываются только эти
+    файлы без обхода каталога. В результате files - манифест обработанных
+    файлов: file_id -> [размер, mtime в нс, хеш содержимого или None]
+    Некорректный UTF-8 в середине большого файла обнаруживается после того, как
+    часть его абзацев ушла дальше: оставшиеся отбрасываются, а discard(file_ids)
+    в конце получает такие файлы, чтобы sink исключил уже принятые абзацы
+    """
+    p = _Pipeline()
+    dirs_q = queue.Queue()
+    files_q = queue.Queue(maxsize=queue_size)
+    paragraphs_q = queue.Queue(maxsize=queue_size)
+    normalized_q = queue.Queue(maxsize=queue_size)
+    pending_dirs = [1]
+
+    def walk():
+        while True:
+            directory = p.get(dirs_q)
+            if directory is _DONE:
+                return
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            with p.lock:
+                                pending_dirs[0] += 1
+                            dirs_q.put(entry.path)
+                        elif entry.is_file(follow_symlinks=False) and entry.name.endswith('.txt'):
+                            stat = entry.stat()
+                            with p.lock:
+                                p.bytes_discovered += stat.st_size
+                            p.put(files_q, (entry.path, stat.st_size, stat.st_mtime_ns))
+            finally:
+                with p.lock:
+                    pending_dirs[0] -= 1
+                    if pending_dirs[0] == 0:
+                        p.walk_done = True
+                        for _ in range(walkers):
+                            dirs_q.put(_DONE)
+
+    def list_files():
+        for item in files:
+            with p.lock:
+                p.bytes_discovered += item[1]
+            p.put(files_q, item)
+        with p.lock:
+            p.walk_done = True
+
+    def read():
+        while True:
+            item = p.get(files_q)
+            if item is _DONE:
+                return
+            path, size, mtime_ns = item
+            file_id = os.path.relpath(path, root)
+            digest = hashlib.blake2b(digest_size=16)
+            emitted = False
+            try:
+                for offset, length, text in iter_file_paragraphs(
+                        path, size, chunk_size, mmap_threshold, max_paragraph_bytes, digest):
+                    p.put(paragraphs_q, (file_id, offset, length, text))
+                    emitted = True
+                file_hash = digest.hexdigest()
+            except UnicodeDecodeError:
+                file_hash = None
+                with p.lock:
+                    p.invalid_files += 1
+                    if emitted:
+                        p.discarded.add(file_id)
+            with p.lock:
+                p.bytes_processed += size
+                p.files_processed += 1
+                p.manifest[file_id] = [size, mtime_ns, file_hash]
+
+    def normalize_stage():
+        # Поток собирает пакет абзацев и ждет его нормализации в процессе, не удерживая GIL
+        done = False
+        while not done:
+            batch = []
+            while len(batch) < batch_size:
+                item = p.get(paragraphs_q)
+                if item is _DONE:
+                    done = True
+                    break
+                batch.append(item)
+            if not batch:
+                continue
+            texts = pool.submit(_normalize_batch, normalize, [item[3] for item in batch]).result()
+            for (file_id, offset, length, _), text in zip(batch, texts):
+                if text:
+                    p.put(normalized_q, (file_id, offset, length, text))
+
+    def report_progress():
+        with p.lock:
+            total = p.bytes_discovered or 1
+            progress = p.bytes_processed * 100 / total
+            if not p.walk_done:
+                progress = min(progress, 99)
+            report(progress,
+                   bytes_processed=p.bytes_processed,
+                   files_processed=p.files_processed,
+                   invalid_files=p.invalid_files,
+                   paragraphs_processed=p.paragraphs)
+
+    def flush(batch):
+        # Абзацы файлов, оказавшихся некорректными после начала разбора, не строятся
+        if p.discarded:
+            batch = [item for item in batch if item[0] not in p.discarded]
+            if not batch:
+                return
+        vectors = embed([item[3] for item in batch])
+        sink([item[:3] for item in batch], vectors)
+        p.paragraphs += len(batch)
+        report_progress()
+
+    pool = ProcessPoolExecutor(normalizers, mp_context=multiprocessing.get_context('spawn'),
+                               initializer=normalize_initializer, initargs=normalize_initargs)
+    try:
+        if files is None:
+            dirs_q.put(root)
+            p.run_stage(walk, walkers, files_q, readers)
+        else:
+            p.run_stage(list_files, 1, files_q, readers)
+        p.run_stage(read, readers, paragraphs_q, normalizers)
+        p.run_stage(normalize_stage, normalizers, normalized_q, 1)
+
+        # Стадия эмбеддингов выполняется в вызывающем потоке
+        batch = []
+        try:
+            while True:
+                item = p.get(normalized_q)
+                if item is _DONE:
+                    break
+                batch.append(item)
+                if len(batch) >= batch_size:
+                    flush(batch)
+                    batch = []
+            if batch and not p.stop.is_set():
+                flush(batch)
+        except Exception as e:
+            p.fail(e)
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    if p.error is not None:
+        raise p.error
+    if p.discarded and discard is not None:
+        discard(p.discarded)
+    report_progress()
+
+    return {
+        "file_count": p.files_processed,
+        "total_bytes": p.bytes_processed,
+        "paragraph_count": p.paragraphs,
+        "invalid_files": p.invalid_files,
+        "files": p.manifest
+    }
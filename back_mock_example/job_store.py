@@ -0,0 +1,276 @@
+"""
+Персистентное хранилище заданий
+SQLite в режиме WAL в общем хранилище: задания и их результаты переживают
+перезапуск контейнера, поиск по job_id, типу и статусу идет по индексам.
+Результат записывается один раз JSON-файлом рядом с базой вместе со сжатыми
+копиями; узлы дерева кластеров дополнительно раскладываются в таблицу для
+выдачи поддеревьев
+"""
+import gzip
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+
+try:
+    import zstandard
+except ImportError:  # zstd необязателен, без него результаты сжимаются только gzip
+    zstandard = None
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id      TEXT PRIMARY KEY,
+    type        TEXT NOT NULL,
+    status      TEXT NOT NULL,
+    progress    INTEGER NOT NULL DEFAULT 0,
+    details     TEXT NOT NULL DEFAULT '{}',
+    data        TEXT NOT NULL DEFAULT '{}',
+    task        TEXT,
+    params      TEXT,
+    error       TEXT,
+    created_at  REAL NOT NULL,
+    started_at  REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_type_status ON jobs (type, status, created_at);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status);
+CREATE TABLE IF NOT EXISTS result_nodes (
+    job_id      TEXT NOT NULL REFERENCES jobs (job_id) ON DELETE CASCADE,
+    node_id     TEXT NOT NULL,
+    parent_id   TEXT,
+    position    INTEGER NOT NULL,
+    node        TEXT NOT NULL,
+    files       TEXT NOT NULL,
+    files_total INTEGER NOT NULL,
+    child_count INTEGER NOT NULL,
+    PRIMARY KEY (job_id, node_id)
+);
+CREATE INDEX IF NOT EXISTS result_nodes_parent ON result_nodes (job_id, parent_id, position);
+"""
+
+# Максимум параметров в одном запросе (ограничение старых сборок SQLite - 999)
+_MAX_SQL_PARAMS = 900
+
+# Сжатые копии результата: Content-Encoding -> расширение файла
+RESULT_ENCODINGS = {'zstd': '.zst', 'gzip': '.gz'} if zstandard else {'gzip': '.gz'}
+
+# Колонки, которые хранятся как JSON
+_JSON_COLUMNS = ('details', 'data', 'params')
+
+# Незавершенные статусы
+UNFINISHED_STATUSES = ('queued', 'processing')
+
+
+class JobStore:
+    """Хранилище заданий поверх SQLite (одно соединение на поток)"""
+
+    def __init__(self, path, results_path):
+        self.path = path
+        self.results_path = results_path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        os.makedirs(results_path, exist_ok=True)
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA foreign_keys=ON')
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _to_job(row):
+        job = json.loads(row['data'])
+        job.update({
+            'job_id': row['job_id'],
+            'type': row['type'],
+            'status': row['status'],
+            'progress': row['progress'],
+            'details': json.loads(row['details']),
+            'task': row['task'],
+            'params': json.loads(row['params']) if row['params'] else None,
+            'error': row['error'],
+            'created_at': row['created_at'],
+            'started_at': row['started_at'],
+            'finished_at': row['finished_at'],
+        })
+        return job
+
+    def create(self, job_id, job_type, data, details, task=None, params=None):
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT INTO jobs (job_id, type, status, details, data, task, params, created_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (job_id, job_type, 'queued', json.dumps(details), json.dumps(data, ensure_ascii=False),
+                 task, json.dumps(params, ensure_ascii=False), time.time())
+            )
+
+    def get(self, job_id):
+        row = self._connect().execute('SELECT * FROM jobs WHERE job_id = ?', (job_id,)).fetchone()
+        return self._to_job(row) if row else None
+
+    def exists(self, job_id):
+        return self._connect().execute('SELECT 1 FROM jobs WHERE job_id = ?', (job_id,)).fetchone() is not None
+
+    def update(self, job_id, **columns):
+        for name in _JSON_COLUMNS:
+            if name in columns:
+                columns[name] = json.dumps(columns[name], ensure_ascii=False)
+        assignments = ', '.join(f'{name} = ?' for name in columns)
+        with self._connect() as conn:
+            conn.execute(f'UPDATE jobs SET {assignments} WHERE job_id = ?', (*columns.values(), job_id))
+
+    def update_data(self, job_id, **fields):
+        """Дополняет данные задания (data) полями fields"""
+        with self._connect() as conn:
+            row = conn.execute('SELECT data FROM jobs WHERE job_id = ?', (job_id,)).fetchone()
+            if row is not None:
+                data = dict(json.loads(row['data']), **fields)
+                conn.execute('UPDATE jobs SET data = ? WHERE job_id = ?',
+                             (json.dumps(data, ensure_ascii=False), job_id))
+
+    def report_progress(self, job_id, progress, details):
+        """Обновляет прогресс, только пока задание выполняется"""
+        with self._connect() as conn:
+            conn.execute("UPDATE jobs SET progress = ?, details = ? WHERE job_id = ? AND status = 'processing'",
+                         (progress, json.dumps(details), job_id))
+
+    def delete(self, job_id):
+        with self._connect() as conn:
+            conn.execute('DELETE FROM jobs WHERE job_id = ?', (job_id,))
+        for encoding in ('identity', *RESULT_ENCODINGS):
+            if os.path.exists(self.result_path(job_id, encoding)):
+                os.remove(self.result_path(job_id, encoding))
+
+    def result_path(self, job_id, encoding='identity'):
+        return os.path.join(self.results_path, f'{job_id}.json{RESULT_ENCODINGS.get(encoding, "")}')
+
+    def save_result(self, job_id, result):
+        """
+        Записывает результат потоковым кодировщиком во временный файл,
+        атомарно переименовывает его и сжимает; дерево кластеров индексируется по узлам
+        """
+        path = self.result_path(job_id)
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            for chunk in json.JSONEncoder(ensure_ascii=False).iterencode(result):
+                f.write(chunk)
+        os.replace(path + '.tmp', path)
+        for encoding in RESULT_ENCODINGS:
+            _compress(path, self.result_path(job_id, encoding), encoding)
+
+        tree = result.get('data') if isinstance(result, dict) else None
+        with self._connect() as conn:
+            conn.execute('DELETE FROM result_nodes WHERE job_id = ?', (job_id,))
+            if isinstance(tree, dict) and 'children' in tree:
+                conn.executemany(
+                    'INSERT OR REPLACE INTO result_nodes '
+                    '(job_id, node_id, parent_id, position, node, files, files_total, child_count) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                    ((job_id, *row) for row in _flatten_tree(tree))
+                )
+
+    def complete(self, job_id):
+        """Переводит задание с сохраненным результатом в completed"""
+        with self._connect() as conn:
+            conn.execute("UPDATE jobs SET status = 'completed', progress = 100, finished_at = ? WHERE job_id = ?",
+                         (time.time(), job_id))
+
+    def fail(self, job_id, error):
+        self.update(job_id, status='failed', error=error, finished_at=time.time())
+
+    def get_result(self, job_id):
+        try:
+            with open(self.result_path(job_id), encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def get_node(self, job_id, node_id, depth, cursor, limit):
+        """
+        Узел дерева кластеров со страницей файлов [cursor, cursor + limit)
+        и потомками до глубины depth (у потомков файлы не выдаются)
+        """
+        conn = self._connect()
+        row = conn.execute('SELECT * FROM result_nodes WHERE job_id = ? AND node_id = ?',
+                           (job_id, node_id)).fetchone()
+        if row is None:
+            return None
+
+        node = _to_node(row)
+        node['files'] = json.loads(row['files'])[cursor:cursor + limit]
+        node['next_cursor'] = cursor + limit if cursor + limit < row['files_total'] else None
+
+        # Потомки выбираются по уровням: один запрос на уровень
+        level = {row['node_id']: node}
+        for _ in range(depth):
+            if not level:
+                break
+            for parent in level.values():
+                parent['children'] = []
+            next_level = {}
+            parent_ids = list(level)
+            for start in range(0, len(parent_ids), _MAX_SQL_PARAMS):
+                chunk = parent_ids[start:start + _MAX_SQL_PARAMS]
+                rows = conn.execute(
+                    f'SELECT node_id, parent_id, node, files_total, child_count FROM result_nodes '
+                    f'WHERE job_id = ? AND parent_id IN ({", ".join("?" * len(chunk))}) ORDER BY position',
+                    (job_id, *chunk)
+                )
+                for child_row in rows:
+                    child = _to_node(child_row)
+                    level[child_row['parent_id']]['children'].append(child)
+                    next_level[child_row['node_id']] = child
+            level = next_level
+        return node
+
+    def find(self, job_type, status):
+        """Задания заданного типа и статуса в порядке создания"""
+        rows = self._connect().execute(
+            'SELECT * FROM jobs WHERE type = ? AND status = ? ORDER BY created_at', (job_type, status)
+        )
+        return [self._to_job(row) for row in rows]
+
+    def unfinished(self):
+        """Задания, прерванные перезапуском, в порядке создания"""
+        rows = self._connect().execute(
+            'SELECT * FROM jobs WHERE status IN (?, ?) ORDER BY created_at', UNFINISHED_STATUSES
+        )
+        return [self._to_job(row) for row in rows]
+
+
+def _compress(source, target, encoding):
+    with open(source, 'rb') as src, open(target + '.tmp', 'wb') as dst:
+        if encoding == 'zstd':
+            zstandard.ZstdCompressor(level=3).copy_stream(src, dst)
+        else:
+            with gzip.GzipFile(fileobj=dst, mode='wb', compresslevel=6, mtime=0) as gz:
+                shutil.copyfileobj(src, gz)
+    os.replace(target + '.tmp', target)
+
+
+def _flatten_tree(root):
+    """Строки (node_id, parent_id, position, node, files, files_total, child_count) обходом в глубину"""
+    stack = [(root, None, 0)]
+    while stack:
+        node, parent_id, position = stack.pop()
+        children = node.get('children') or []
+        files = node.get('files') or []
+        fields = {key: value for key, value in node.items() if key not in ('children', 'files')}
+        yield (node['id'], parent_id, position, json.dumps(fields, ensure_ascii=False),
+               json.dumps(files, ensure_ascii=False), len(files), len(children))
+        stack.extend((child, node['id'], i) for i, child in enumerate(children))
+
+
+def _to_node(row):
+    node = json.loads(row['node'])
+    node['files_total'] = row['files_total']
+    node['children_count'] = row['child_count']
+    return node
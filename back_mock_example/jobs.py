@@ -0,0 +1,180 @@
+"""
+Движок фоновых заданий
+Ограниченная очередь заданий, пул процессов-обработчиков и лимиты
+одновременного выполнения для каждого типа задания
+"""
+import collections
+import multiprocessing
+import threading
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from job_store import JobStore
+
+# Канал прогресса и хранилище внутри процесса-обработчика (задаются при запуске процесса)
+_progress_channel = None
+_store = None
+
+
+class QueueFullError(Exception):
+    """Очередь заданий переполнена"""
+
+
+class ProgressReporter:
+    """Передает прогресс выполнения из процесса-обработчика в движок"""
+
+    # Минимальный интервал между отправками промежуточного прогресса (сек.)
+    min_interval = 0.5
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self._last_progress = None
+        self._last_sent = 0.0
+
+    def __call__(self, progress, **details):
+        progress = max(0, min(int(progress), 100))
+        now = time.monotonic()
+        if progress == self._last_progress and now - self._last_sent < self.min_interval:
+            return
+        self._last_progress = progress
+        self._last_sent = now
+        if _progress_channel is not None:
+            _progress_channel.put((self.job_id, progress, details))
+
+
+def _init_worker(channel, store_path, results_path):
+    global _progress_channel, _store
+    _progress_channel = channel
+    _store = JobStore(store_path, results_path)
+
+
+def _run_job(job_id, task, params):
+    # Результат пишется на диск в процессе-обработчике и не передается обратно
+    _store.save_result(job_id, task(params, ProgressReporter(job_id)))
+
+
+class JobEngine:
+    """Планировщик фоновых заданий поверх пула процессов"""
+
+    def __init__(self, store, workers, queue_size, type_limits):
+        self._store = store
+        self._workers = workers
+        self._queue_size = queue_size
+        self._type_limits = type_limits
+        self._cond = threading.Condition()
+        self._pending = collections.deque()
+        self._running = collections.Counter()
+        self._ctx = multiprocessing.get_context('spawn')
+        self._executor = None
+        self._channel = None
+        self._listeners = []
+        self._update_listeners = []
+
+    def _start(self):
+        # Пул и служебные потоки создаются при первом задании,
+        # чтобы не запускать их в процессе-наблюдателе Flask
+        self._channel = self._ctx.Queue()
+        self._executor = self._create_executor()
+        threading.Thread(target=self._dispatch_loop, daemon=True).start()
+        threading.Thread(target=self._progress_loop, daemon=True).start()
+
+    def _create_executor(self):
+        return ProcessPoolExecutor(
+            max_workers=self._workers,
+            mp_context=self._ctx,
+            initializer=_init_worker,
+            initargs=(self._channel, self._store.path, self._store.results_path)
+        )
+
+    def add_listener(self, callback):
+        """callback(job_id, job_type, status) вызывается по завершении каждого задания"""
+        self._listeners.append(callback)
+
+    def add_update_listener(self, callback):
+        """callback(job_id) вызывается после каждого изменения задания в хранилище"""
+        self._update_listeners.append(callback)
+
+    def _notify_update(self, job_id):
+        for callback in self._update_listeners:
+            try:
+                callback(job_id)
+            except Exception as e:
+                traceback.print_exception(type(e), e, e.__traceback__)
+
+    def submit(self, job_id, job_type, task, params):
+        """Ставит задание в очередь, при переполнении выбрасывает QueueFullError"""
+        with self._cond:
+            if len(self._pending) >= self._queue_size:
+                raise QueueFullError(job_type)
+            if self._executor is None:
+                self._start()
+            self._pending.append((job_id, job_type, task, params))
+            self._cond.notify_all()
+
+    def queue_length(self):
+        with self._cond:
+            return len(self._pending)
+
+    def _next_runnable(self):
+        if sum(self._running.values()) >= self._workers:
+            return None
+        for entry in self._pending:
+            job_type = entry[1]
+            if self._running[job_type] < self._type_limits.get(job_type, self._workers):
+                self._pending.remove(entry)
+                return entry
+        return None
+
+    def _dispatch_loop(self):
+        while True:
+            with self._cond:
+                entry = self._next_runnable()
+                while entry is None:
+                    self._cond.wait()
+                    entry = self._next_runnable()
+                job_id, job_type, task, params = entry
+                self._running[job_type] += 1
+            self._store.update(job_id, status='processing', started_at=time.time())
+            self._notify_update(job_id)
+
+            try:
+                future = self._executor.submit(_run_job, job_id, task, params)
+            except BrokenProcessPool:
+                # Процесс-обработчик аварийно завершился, пул пересоздается
+                self._executor = self._create_executor()
+                future = self._executor.submit(_run_job, job_id, task, params)
+            future.add_done_callback(
+                lambda f, job_id=job_id, job_type=job_type: self._on_done(job_id, job_type, f)
+            )
+
+    def _on_done(self, job_id, job_type, future):
+        try:
+            future.result()
+            self._store.complete(job_id)
+            status = 'completed'
+        except Exception as e:
+            traceback.print_exception(type(e), e, e.__traceback__)
+            self._store.fail(job_id, str(e))
+            status = 'failed'
+        with self._cond:
+            self._running[job_type] -= 1
+            self._cond.notify_all()
+        self._notify_update(job_id)
+
+        for callback in self._listeners:
+            try:
+                callback(job_id, job_type, status)
+            except Exception as e:
+                traceback.print_exception(type(e), e, e.__traceback__)
+
+    def _progress_loop(self):
+        while True:
+            job_id, progress, details = self._channel.get()
+            job = self._store.get(job_id)
+            if not job or job['status'] != 'processing':
+                continue
+            job['details'].update(details)
+            self._store.report_progress(job_id, progress, job['details'])
+            self._notify_update(job_id)
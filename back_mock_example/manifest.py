@@ -0,0 +1,99 @@
+"""
+Манифест загруженного корпуса: размер, время изменения и хеш каждого файла
+По манифесту прошлой загрузки того же каталога повторная загрузка находит
+новые, измененные и удаленные файлы; векторы остальных переносятся без модели
+"""
+import hashlib
+import json
+import os
+
+MANIFEST_FILE = 'manifest.json'
+
+
+def file_digest(path, chunk_size=4 * 1024 * 1024):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def scan_files(root):
+    """.txt файлы каталога root: file_id -> (путь, размер, mtime в нс)"""
+    files = {}
+    for directory, _, names in os.walk(root):
+        for name in names:
+            path = os.path.join(directory, name)
+            # Символические ссылки пропускаются, как при обходе каталога загрузкой
+            if name.endswith('.txt') and not os.path.islink(path):
+                stat = os.stat(path)
+                files[os.path.relpath(path, root)] = (path, stat.st_size, stat.st_mtime_ns)
+    return files
+
+
+def load_manifest(corpus_dir):
+    with open(os.path.join(corpus_dir, MANIFEST_FILE), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_manifest(corpus_dir, files, deleted=(), previous_corpus_id=None):
+    """files: file_id -> [размер, mtime в нс, хеш или None для файла с некорректным UTF-8]"""
+    path = os.path.join(corpus_dir, MANIFEST_FILE)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump({"files": files, "deleted": sorted(deleted), "previous_corpus_id": previous_corpus_id},
+                  f, ensure_ascii=False)
+    os.replace(path + '.tmp', path)
+
+
+def diff_files(previous, current):
+    """
+    Сравнивает файлы манифеста previous с результатом scan_files
+    Файл с прежними размером и mtime считается неизменным без чтения, при
+    прежнем размере и новом mtime сравнивается хеш. Возвращает (новые и измененные
+    файлы [(путь, размер, mtime)], неизменные file_id -> запись манифеста,
+    удаленные file_id, число измененных)
+    """
+    changed, unchanged = [], {}
+    modified = 0
+    for file_id, (path, size, mtime_ns) in current.items():
+        entry = previous.get(file_id)
+        if entry is not None and entry[0] == size:
+            if entry[1] == mtime_ns:
+                unchanged[file_id] = entry
+                continue
+            if entry[2] is not None and file_digest(path) == entry[2]:
+                unchanged[file_id] = [size, mtime_ns, entry[2]]
+                continue
+        if entry is not None:
+            modified += 1
+        changed.append((path, size, mtime_ns))
+    deleted = [file_id for file_id in previous if file_id not in current]
+    return changed, unchanged, deleted, modified
+
+
+def find_previous_corpus(corpora_path, corpus_path, model_id, exclude=None):
+    """
+    Каталог последней готовой загрузки каталога corpus_path той же моделью с манифестом или None
+    exclude - corpus_id текущей загрузки: возобновленное задание не должно найти свой же каталог
+    """
+    latest, latest_time = None, None
+    try:
+        entries = list(os.scandir(corpora_path))
+    except FileNotFoundError:
+        return None
+    for entry in entries:
+        if entry.name == exclude:
+            continue
+        try:
+            with open(os.path.join(entry.path, 'meta.json'), encoding='utf-8') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if meta.get('corpus_path') != corpus_path or meta.get('model_id') != model_id:
+            continue
+        if not os.path.exists(os.path.join(entry.path, MANIFEST_FILE)):
+            continue
+        created_at = meta.get('created_at', 0)
+        if latest is None or created_at > latest_time:
+            latest, latest_time = entry.path, created_at
+    return latest
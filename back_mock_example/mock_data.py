@@ -1235,6 +1235,18 @@ MOCK_CLUSTER_RESULT = {
     "drill-down_representation": "http://localhost:3000/api/visualization/drilldown"
 }
 
+# Экспертная разметка файлов кластерной классификации
+MOCK_CLUSTER_EXPERT_MAPPING = {
+    "new_ai_research.txt": "cluster1",
+    "tech_report.pdf": "cluster1",
+    "physics_paper.txt": "cluster2",
+    "biology_study.pdf": "cluster2",
+    "market_analysis.docx": "cluster3",
+    "financial_report.pdf": "cluster3",
+    "file001.txt": "c1",
+    "file002.txt": "c2"
+}
+
 MOCK_FINE_TUNING_RESULT = {
     "new_model_id": f"fine_tuned_{str(uuid.uuid4())[:8]}", # или любой другой id
     "base_model_id": "base_model_001",
@@ -1403,4 +1415,27 @@ MOCK_FINE_TUNING_RESULT = {
             "documents_in_unchanged_clusters": 12020,
         }
     }
-}
\ No newline at end of file
+}
+
+# Рубрики ветви ГРНТИ "военное дело" по умолчанию (коды, встречающиеся в mock-данных);
+# полный рубрикатор подключается файлом GRNTI_RUBRICS_PATH
+MOCK_GRNTI_RUBRICS = [
+    {"code": "76", "name": "Военное дело"},
+    {"code": "76.01", "name": "Общие вопросы военной науки и техники"},
+    {"code": "76.01.00", "name": "Общие вопросы военной науки и техники"},
+    {"code": "76.01.07", "name": "Системный анализ, управление и обработка информации в военном деле"},
+    {"code": "76.03", "name": "Военное искусство"},
+    {"code": "76.03.00", "name": "Военное искусство"},
+    {"code": "76.03.01", "name": "Стратегия и оперативное искусство"},
+    {"code": "76.03.03", "name": "Тактика"},
+    {"code": "76.05", "name": "Военная история"},
+    {"code": "76.05.01", "name": "История войн и военного искусства"},
+    {"code": "76.15", "name": "Вооружение и военная техника"},
+    {"code": "76.15.05", "name": "Стрелковое оружие"},
+    {"code": "76.15.11", "name": "Бронетанковая техника"},
+    {"code": "76.17", "name": "Военно-морской флот"},
+    {"code": "76.17.01", "name": "Боевые корабли и подводные лодки"},
+    {"code": "76.29", "name": "Военная авиация и противовоздушная оборона"},
+    {"code": "76.29.01", "name": "Боевые самолеты и вертолеты"},
+    {"code": "76.29.05", "name": "Авиационное вооружение"},
+]
@@ -0,0 +1,66 @@
+"""
+Реестр моделей эмбеддингов
+Описания моделей индексируются по model_id, сами модели загружаются
+при первом использовании и держатся в LRU-кэше с ограничением по памяти
+"""
+import collections
+import threading
+import zlib
+
+from embedder import HashingModel
+
+
+class ModelRegistry:
+    """Описания моделей и кэш загруженных моделей"""
+
+    def __init__(self, models, max_bytes):
+        self.max_bytes = max_bytes
+        self._models = {m['model_id']: dict(m) for m in models}
+        self._loaded = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def describe(self, model_id):
+        """Описание модели или None"""
+        return self._models.get(model_id)
+
+    def register(self, model):
+        """Добавляет описание модели (например, дообученной)"""
+        with self._lock:
+            self._models[model['model_id']] = dict(model)
+
+    def get(self, model_id):
+        """Загруженная модель; при нехватке памяти выгружаются давно не использованные"""
+        with self._lock:
+            model = self._loaded.get(model_id)
+            if model is not None:
+                self._loaded.move_to_end(model_id)
+                return model
+
+            description = self._models[model_id]
+            model = self._load(description)
+            self._loaded[model_id] = model
+            while len(self._loaded) > 1 and self.resident_bytes() > self.max_bytes:
+                self._loaded.popitem(last=False)
+            return model
+
+    @staticmethod
+    def _load(description):
+        # Дообученная модель получает свое зерно, чтобы ее векторы отличались от базовой
+        seed = zlib.crc32(description['model_id'].encode('utf-8')) if description.get('base_model_id') else 0
+        return HashingModel(description['model_id'], description['dimension'], seed)
+
+    def resident_bytes(self):
+        return sum(model.memory_bytes for model in self._loaded.values())
+
+    def list(self):
+        """Описания всех моделей с признаком загрузки и занимаемой памятью"""
+        with self._lock:
+            result = []
+            for model_id, description in self._models.items():
+                loaded = self._loaded.get(model_id)
+                result.append(dict(
+                    description,
+                    resident=loaded is not None,
+                    memory_bytes=loaded.memory_bytes if loaded is not None else 0
+                ))
+            return result
@@ -0,0 +1,273 @@
+"""
+Нормализация русского текста
+Удаляет служебные и невидимые символы, склеивает слова, разорванные переносом
+строки, приводит слова к нормальной форме, удаляет стоп-слова и схлопывает
+пробельные символы. Текст обрабатывается за один проход по блокам:
+незавершенное на границе блока слово переносится в следующий блок, поэтому
+результат не зависит от размера блоков. Кэш двухуровневый и общий для всех
+потоков процесса: токен как есть -> результат (попадание - поиск в словаре
+без вызова кода Python) и ограниченный LRU нормальных форм слов без
+пунктуации, к которому токен обращается при промахе первого уровня
+"""
+import codecs
+import itertools
+import re
+import string
+from functools import lru_cache
+
+try:
+    import pymorphy3
+except ImportError:  # без морфологического анализатора нормальная форма - слово в нижнем регистре
+    pymorphy3 = None
+
+# Размер блока, которым normalize_text проходит длинный текст
+CHUNK_SIZE = 1024 * 1024
+
+# Слово длиннее этого не ищется целиком при поиске границы блока
+MAX_TOKEN_CHARS = 256
+
+# Управляющие и невидимые символы, которые не являются пробельными: мягкий перенос,
+# пробелы нулевой ширины, BOM; пробельные символы всех видов схлопывает str.split()
+_INVISIBLE_RE = re.compile('[\x00-\x08\x0e-\x1b\x7f\xad\u200b-\u200d\u2060\ufeff]+')
+
+# Перенос: буква, дефис, перевод строки и строчная буква продолжения слова
+# (дефис идет первым, чтобы поиск шел по литералу)
+_HYPHEN_BREAK_RE = re.compile(r'-(?<=\w-)[ \t]*\r?\n[ \t]*(?=[а-яёa-z])')
+
+# Последнее слово перед концом блока
+_LAST_TOKEN_RE = re.compile(r'\S+\Z')
+
+# Служебные слова без самостоятельного смысла; отрицания не удаляются
+_RUSSIAN_STOP_WORDS = """
+и в во что он на я с со как а то все она так его но да ты к у же вы за бы по только
+ее мне было вот от меня еще о из ему теперь когда даже ну вдруг ли если уже или быть
+был него до вас нибудь опять уж вам ведь там потом себя ничего ей может они тут где
+есть надо ней для мы тебя их чем была сам чтоб без будто чего раз тоже себе под
+будет ж тогда кто этот того потому этого какой совсем ним здесь этом один почти мой
+тем чтобы нее сейчас были куда зачем всех никогда можно при наконец два об другой
+хоть после над больше тот через эти нас про всего них какая много разве три эту моя
+впрочем хорошо свою этой перед иногда лучше чуть том нельзя такой им более всегда
+конечно всю между это также которые который которая которое которых этих либо
+"""
+
+STOP_WORDS = frozenset(_RUSSIAN_STOP_WORDS.split())
+
+# Пунктуация, которая отделяется от слова перед анализом и возвращается на место
+_PUNCTUATION = string.punctuation + '«»„“”‘’…–—'
+
+# Размер кэша нормальных форм по умолчанию: словоформ в текстах - сотни тысяч
+CACHE_SIZE = 300000
+
+# Нормальные формы из словаря, загруженного configure(): словоформа -> нормальная форма
+_dictionary = {}
+
+# Морфологический анализатор создается при первом обращении
+_morph = None
+
+
+def _analyze(word):
+    """Нормальная форма слова в нижнем регистре без пунктуации; '' для стоп-слова"""
+    global _morph
+    if word in STOP_WORDS:
+        return ''
+    normal = _dictionary.get(word)
+    if normal is None:
+        normal = word
+        if pymorphy3 is not None:
+            if _morph is None:
+                _morph = pymorphy3.MorphAnalyzer()
+            normal = _morph.parse(word)[0].normal_form.replace('ё', 'е')
+    return normal
+
+
+# LRU слово -> нормальная форма перед анализатором; пересоздается configure()
+normal_form = lru_cache(maxsize=CACHE_SIZE)(_analyze)
+
+
+def _token_form(token):
+    """Нормальная форма слова токена с сохранением пунктуации вокруг него; '' для стоп-слова"""
+    word = token.strip(_PUNCTUATION)
+    if not word:
+        return token
+    normal = normal_form(word.lower().replace('ё', 'е'))
+    if not normal:
+        return ''
+    start = token.index(word)
+    return token[:start] + normal + token[start + len(word):]
+
+
+class _TokenForms(dict):
+    """
+    Первый уровень кэша: токен как есть -> результат _token_form с завершающим
+    пробелом ('' для стоп-слова), так что текст собирается ''.join без фильтра
+    Попадание обслуживает dict без вызова кода Python, промах вызывает
+    __missing__. При переполнении вытесняется четверть самых старых записей,
+    а после первого переполнения в кэш попадают только токены, встреченные
+    повторно (первая встреча запоминается в _seen без формы): поток редких
+    слов словаря больше кэша не вытесняет частые. Отметки попаданий, нужные
+    для LRU, сделали бы попадание вызовом кода Python. Токены с непечатаемыми
+    символами не кэшируются, а считаются в unprintable: по изменению счетчика
+    вызывающий узнает, что в тексте есть невидимые символы
+    """
+
+    def __init__(self, maxsize):
+        super().__init__()
+        self.maxsize = maxsize
+        self.lookups = 0
+        self.misses = 0
+        self.unprintable = 0
+        # Токены, встреченные один раз после переполнения, в порядке встречи
+        self._seen = {}
+        self._full = False
+
+    def __missing__(self, token):
+        self.misses += 1
+        form = _token_form(token)
+        if form:
+            form += ' '
+        if not token.isprintable():
+            self.unprintable += 1
+        elif self.maxsize > 0:
+            if self._full and self._seen.pop(token, None) is None:
+                self._seen[token] = True
+                if len(self._seen) > self.maxsize:
+                    for key in list(itertools.islice(self._seen, self.maxsize // 4)):
+                        self._seen.pop(key, None)
+                return form
+            if len(self) >= self.maxsize:
+                for key in list(itertools.islice(self, max(1, self.maxsize // 4))):
+                    self.pop(key, None)
+                self._full = True
+            self[token] = form
+        return form
+
+
+_token_forms = _TokenForms(CACHE_SIZE)
+
+
+def configure(cache_size=CACHE_SIZE, dictionary_path=None):
+    """
+    Размер кэша нормальных форм (каждого уровня) и необязательный словарь нормальных
+    форм (TSV: словоформа, табуляция, нормальная форма), который проверяется до анализатора
+    """
+    global normal_form, _token_forms
+    _dictionary.clear()
+    if dictionary_path:
+        with open(dictionary_path, encoding='utf-8') as f:
+            for line in f:
+                form, _, normal = line.rstrip('\n').partition('\t')
+                if normal:
+                    _dictionary[form.lower().replace('ё', 'е')] = normal.replace('ё', 'е')
+    normal_form = lru_cache(maxsize=cache_size)(_analyze)
+    _token_forms = _TokenForms(cache_size)
+
+
+def cache_info():
+    """Попадания, промахи и заполнение кэша нормальных форм этого процесса по уровням"""
+    tokens = _token_forms
+    info = normal_form.cache_info()
+    return {
+        "hits": tokens.lookups - tokens.misses,
+        "misses": tokens.misses,
+        "size": len(tokens),
+        "max_size": tokens.maxsize,
+        "word_hits": info.hits,
+        "word_misses": info.misses,
+        "word_size": info.currsize,
+        "dictionary_size": len(_dictionary),
+        "analyzer": "pymorphy3" if pymorphy3 is not None else "lowercase"
+    }
+
+
+def _normalize_words(text, forms):
+    tokens = _HYPHEN_BREAK_RE.sub('', text).split()
+    forms.lookups += len(tokens)
+    # Каждая форма кончается пробелом, последний отбрасывается
+    return ''.join(map(forms.__getitem__, tokens))[:-1]
+
+
+def _normalize_complete(text):
+    """Нормализация текста, не обрывающегося на середине слова"""
+    forms = _token_forms
+    unprintable = forms.unprintable
+    normalized = _normalize_words(text, forms)
+    # Счетчик меняется и от токенов других потоков - тогда лишь выполняется медленный путь
+    if forms.unprintable == unprintable:
+        return normalized
+    # Редкий случай: в тексте есть невидимые символы, они удаляются до разбиения на слова
+    return _normalize_words(_INVISIBLE_RE.sub('', text), forms)
+
+
+class StreamNormalizer:
+    """Потоковая нормализация: feed() принимает очередной блок текста и возвращает готовую часть результата"""
+
+    def __init__(self):
+        self._tail = ''
+        self._started = False
+
+    def _emit(self, normalized):
+        if not normalized:
+            return ''
+        if self._started:
+            return ' ' + normalized
+        self._started = True
+        return normalized
+
+    @staticmethod
+    def _token_start(text, end):
+        """Начало слова, которое кончается в позиции end (слово, а не пробелы)"""
+        match = _LAST_TOKEN_RE.search(text, max(0, end - MAX_TOKEN_CHARS), end)
+        return match.start() if match else end
+
+    @staticmethod
+    def _word_end(text, end):
+        """Конец последнего слова до позиции end"""
+        window = max(0, end - MAX_TOKEN_CHARS)
+        return window + len(text[window:end].rstrip())
+
+    def feed(self, chunk):
+        text = self._tail + chunk
+        # Последнее слово может продолжиться в следующем блоке, а слово с дефисом - склеиться
+        # со следующим через перенос строки: такие слова переносятся в следующий блок
+        cut = self._word_end(text, len(text))
+        if cut == len(text) or text.endswith('-', 0, cut):
+            cut = self._token_start(text, cut)
+            while cut and text.endswith('-', 0, self._word_end(text, cut)):
+                cut = self._token_start(text, self._word_end(text, cut))
+        self._tail = text[cut:]
+        return self._emit(_normalize_complete(text[:cut]))
+
+    def finish(self):
+        text, self._tail = self._tail, ''
+        return self._emit(_normalize_complete(text))
+
+
+def decode_chunks(chunks, errors='replace'):
+    """Текст из блоков байт UTF-8; символ, разорванный границей блока, собирается целиком"""
+    decoder = codecs.getincrementaldecoder('utf-8')(errors)
+    for chunk in chunks:
+        text = decoder.decode(chunk)
+        if text:
+            yield text
+    text = decoder.decode(b'', final=True)
+    if text:
+        yield text
+
+
+def iter_normalized(chunks):
+    """Нормализованный текст по частям для последовательности блоков текста"""
+    normalizer = StreamNormalizer()
+    for chunk in chunks:
+        normalized = normalizer.feed(chunk)
+        if normalized:
+            yield normalized
+    normalized = normalizer.finish()
+    if normalized:
+        yield normalized
+
+
+def normalize_text(text, chunk_size=CHUNK_SIZE):
+    """Нормализованный текст; длинный текст обрабатывается блоками по chunk_size символов"""
+    if len(text) <= chunk_size:
+        return _normalize_complete(text)
+    return ''.join(iter_normalized(text[start:start + chunk_size] for start in range(0, len(text), chunk_size)))
@@ -0,0 +1,125 @@
+"""
+Семантический поиск по загруженному корпусу
+Кандидаты-абзацы берутся из IVF-индекса корпуса, результаты группируются по файлам.
+Текст превью и фрагмента читается из исходных файлов, поэтому файлы, удаленные или
+измененные после загрузки корпуса (сверка с его манифестом), в выдачу не попадают
+"""
+import collections
+import json
+import os
+import threading
+
+from ann_index import INDEX_META, IVFIndex
+from manifest import MANIFEST_FILE, file_digest, load_manifest
+from vector_store import VectorStore
+
+# Во сколько раз больше абзацев запрашивается у индекса, чтобы набрать k разных файлов
+OVERSAMPLE = 4
+
+PREVIEW_CHARS = 200
+FRAGMENT_CHARS = 500
+
+
+def _read_text(path, offset, length):
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        return f.read(length).decode('utf-8', errors='replace')
+
+
+class CorpusSearcher:
+    """Индекс и метаданные абзацев одного корпуса"""
+
+    def __init__(self, corpus_dir):
+        with open(os.path.join(corpus_dir, 'meta.json'), encoding='utf-8') as f:
+            self.meta = json.load(f)
+        self.index = IVFIndex(corpus_dir) if os.path.exists(os.path.join(corpus_dir, INDEX_META)) else None
+        self.store = VectorStore(corpus_dir)
+        # Корпус, загруженный до появления манифестов, сверяется только по наличию файлов
+        has_manifest = os.path.exists(os.path.join(corpus_dir, MANIFEST_FILE))
+        self.manifest = load_manifest(corpus_dir)['files'] if has_manifest else None
+        # Итог сверки по хешу файлов с новым mtime: file_id -> (размер, mtime в нс, совпал ли хеш)
+        self._verified = {}
+
+    def _unchanged(self, file_id, path):
+        """
+        Файл на месте и совпадает с записью манифеста: размер и mtime или, при новом
+        mtime, хеш. Хеш файла с данными размером и mtime считается один раз, дальше
+        запросы обходятся вызовом stat
+        """
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return False
+        if self.manifest is None:
+            return True
+        entry = self.manifest.get(file_id)
+        if entry is None or entry[0] != stat.st_size:
+            return False
+        if entry[1] == stat.st_mtime_ns:
+            return True
+        if entry[2] is None:
+            return False
+        verified = self._verified.get(file_id)
+        if verified is None or verified[:2] != (stat.st_size, stat.st_mtime_ns):
+            verified = (stat.st_size, stat.st_mtime_ns, file_digest(path) == entry[2])
+            self._verified[file_id] = verified
+        return verified[2]
+
+    def search(self, query_vector, k, nprobe):
+        if self.index is None:
+            return []
+
+        ids, scores = self.index.search(query_vector, k * OVERSAMPLE, nprobe)
+        results, seen = [], set()
+        for paragraph_id, score in zip(ids, scores):
+            file_id, offset, length = self.store.record(paragraph_id)
+            if file_id in seen:
+                continue
+            seen.add(file_id)
+            path = os.path.join(self.meta['root'], file_id)
+            if not self._unchanged(file_id, path):
+                continue
+            try:
+                preview = _read_text(path, 0, PREVIEW_CHARS * 4)[:PREVIEW_CHARS]
+                fragment = _read_text(path, offset, length)[:FRAGMENT_CHARS]
+            except OSError:
+                # Файл удален между проверкой и чтением
+                continue
+            results.append({
+                "file_id": file_id,
+                "score": round(float(score), 4),
+                "preview": preview,
+                "fragment": fragment
+            })
+            if len(results) >= k:
+                break
+        return results
+
+
+class SearcherCache:
+    """LRU загруженных корпусов"""
+
+    def __init__(self, corpora_path, size):
+        self.corpora_path = corpora_path
+        self.size = size
+        self._searchers = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, corpus_id):
+        """Поисковик корпуса или None, если корпус не загружен"""
+        with self._lock:
+            searcher = self._searchers.get(corpus_id)
+            if searcher is not None:
+                self._searchers.move_to_end(corpus_id)
+                return searcher
+
+        corpus_dir = os.path.join(self.corpora_path, os.path.basename(corpus_id))
+        if not os.path.exists(os.path.join(corpus_dir, 'meta.json')):
+            return None
+        searcher = CorpusSearcher(corpus_dir)
+
+        with self._lock:
+            self._searchers[corpus_id] = searcher
+            while len(self._searchers) > self.size:
+                self._searchers.popitem(last=False)
+        return searcher
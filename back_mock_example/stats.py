@@ -0,0 +1,32 @@
+"""
+Статистика узлов дерева кластеров
+Размер, средний косинус до центроида и similarityDistribution всех узлов
+считаются разом по плоским массивам принадлежности (узел, документ, косинус),
+которые кластеризация уже получила при назначении документов центроидам
+"""
+import numpy as np
+
+# Корзины similarityDistribution: [0, 0.2), [0.2, 0.4), ..., [0.8, 1.0]
+SIMILARITY_BUCKETS = 5
+
+
+def bucketize(similarities, buckets=SIMILARITY_BUCKETS):
+    """Номер корзины каждого косинуса; отрицательные попадают в первую, 1.0 - в последнюю"""
+    return np.clip((np.asarray(similarities) * buckets).astype(np.int64), 0, buckets - 1)
+
+
+def node_stats(nodes, similarities, node_count, buckets=SIMILARITY_BUCKETS):
+    """
+    nodes[i] - номер узла, similarities[i] - косинус документа до центроида
+    этого узла (документ входит в массивы по разу на каждый свой узел)
+    Возвращает размеры, средние косинусы и доли корзин для каждого из node_count узлов
+    """
+    nodes = np.asarray(nodes, dtype=np.int64)
+    counts = np.bincount(nodes, minlength=node_count)
+    totals = np.bincount(nodes, weights=similarities, minlength=node_count)
+    histogram = np.bincount(nodes * buckets + bucketize(similarities, buckets),
+                            minlength=node_count * buckets).reshape(node_count, buckets)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        averages = np.where(counts > 0, totals / counts, 0.0)
+        distributions = np.where(counts[:, None] > 0, histogram / counts[:, None], 0.0)
+    return counts, averages, distributions
@@ -0,0 +1,306 @@
+"""
+Задачи, выполняемые в процессах-обработчиках движка заданий
+Каждая задача получает параметры задания и функцию report(progress, **details)
+и возвращает результат задания
+"""
+import json
+import os
+import shutil
+import time
+import uuid
+
+import numpy as np
+
+import normalizer
+from ann_index import INDEX_META, build_ivf_index
+import grnti
+from classification import classify_documents
+from clustering import FILE_VECTORS, build_cluster_tree, build_file_vectors, load_centroids
+from config import (
+    ANN_NLIST,
+    CLASSIFICATION_TOP_K,
+    CLUSTER_BATCH_SIZE,
+    CLUSTER_ITERATIONS,
+    CLUSTER_MAX_DEPTH,
+    CLUSTER_MAX_K,
+    CLUSTER_MIN_SIZE,
+    CLUSTER_PROCESSES,
+    CLUSTER_SAMPLE_SIZE,
+    CLUSTER_THREADS,
+    GRNTI_BEAM,
+    GRNTI_CACHE_PATH,
+    GRNTI_MIN_LEVEL,
+    GRNTI_MIN_SIMILARITY,
+    GRNTI_RUBRICS_PATH,
+    GRNTI_THREADS,
+    CORPORA_PATH,
+    EMBEDDING_CACHE_DISK_SIZE,
+    EMBEDDING_CACHE_PATH,
+    EMBEDDING_CACHE_SIZE,
+    INGEST_BATCH_SIZE,
+    INGEST_CHUNK_SIZE,
+    INGEST_MMAP_THRESHOLD,
+    INGEST_NORMALIZERS,
+    INGEST_QUEUE_SIZE,
+    INGEST_READERS,
+    INGEST_WALKERS,
+    JOB_RESULTS_PATH,
+    MODEL_CACHE_MAX_BYTES,
+    NORMALIZER_CACHE_SIZE,
+    NORMALIZER_DICTIONARY_PATH,
+    SHARED_DATA_PATH,
+    VECTOR_DTYPE,
+)
+from embedding_cache import EmbeddingCache
+from ingest import ingest_corpus
+from manifest import diff_files, find_previous_corpus, load_manifest, save_manifest, scan_files
+from models import ModelRegistry
+from vector_store import VectorStore, VectorStoreWriter
+from mock_data import (
+    MOCK_CLUSTER_RESULT,
+    MOCK_FINE_TUNING_RESULT,
+    MOCK_GRNTI_RUBRICS,
+    MOCK_MODELS,
+)
+
+
+def resolve_corpus_path(corpus_path):
+    """
+    Переводит x-corpus-path (/<id> или /shared_data/<id>) в путь внутри общего хранилища;
+    None, если путь (с учетом .. и символических ссылок) выходит за пределы хранилища
+    """
+    relative = corpus_path.strip('/')
+    if relative == 'shared_data' or relative.startswith('shared_data/'):
+        relative = relative[len('shared_data'):].lstrip('/')
+    base = os.path.realpath(SHARED_DATA_PATH)
+    path = os.path.realpath(os.path.join(base, relative))
+    if os.path.commonpath([base, path]) != base:
+        return None
+    return path
+
+
+# Кэш нормальных форм: модуль импортируют и сервер, и процессы-обработчики
+normalizer.configure(NORMALIZER_CACHE_SIZE, NORMALIZER_DICTIONARY_PATH)
+
+# Модели, загруженные в этом процессе-обработчике
+_models = ModelRegistry(MOCK_MODELS, MODEL_CACHE_MAX_BYTES)
+
+# Эмбеддинги уже встречавшихся абзацев
+_embeddings = EmbeddingCache(EMBEDDING_CACHE_PATH, EMBEDDING_CACHE_SIZE, EMBEDDING_CACHE_DISK_SIZE)
+
+
+def load_model(description):
+    """Модель по описанию из параметров задания (описание может быть дообученной модели)"""
+    if _models.describe(description['model_id']) is None:
+        _models.register(description)
+    return _models.get(description['model_id'])
+
+
+def scaled(report, start, end):
+    """Отображает прогресс этапа 0..100 на отрезок start..end общего прогресса задания"""
+    return lambda progress, **details: report(start + progress * (end - start) / 100, **details)
+
+
+def centroids_path(job_id):
+    """Центроиды узлов дерева завершенного задания кластеризации"""
+    return os.path.join(JOB_RESULTS_PATH, f'{job_id}.centroids.npz')
+
+
+def embed_corpus(model, root, target_dir, report, previous_dir=None):
+    """
+    Эмбеддинги абзацев .txt файлов каталога root в хранилище векторов target_dir
+    С previous_dir (прошлая загрузка того же каталога) векторы неизменившихся
+    файлов переносятся из нее, а через модель проходят только новые и измененные;
+    удаленные файлы в новое хранилище не попадают. Манифест пишется в target_dir
+    """
+    files, unchanged, deleted, modified = None, {}, [], 0
+    if previous_dir:
+        files, unchanged, deleted, modified = diff_files(load_manifest(previous_dir)['files'], scan_files(root))
+
+    with VectorStoreWriter(target_dir, model.dimension, VECTOR_DTYPE) as writer:
+        if unchanged:
+            writer.copy_files(VectorStore(previous_dir), unchanged)
+        stats = ingest_corpus(
+            root,
+            embed=lambda texts: _embeddings.embed(model.model_id, model.dimension, texts,
+                                                  lambda missing: model.embed(missing, INGEST_BATCH_SIZE)),
+            sink=writer.append,
+            discard=writer.discard_files,
+            report=report,
+            walkers=INGEST_WALKERS,
+            readers=INGEST_READERS,
+            normalizers=INGEST_NORMALIZERS,
+            batch_size=INGEST_BATCH_SIZE,
+            queue_size=INGEST_QUEUE_SIZE,
+            chunk_size=INGEST_CHUNK_SIZE,
+            mmap_threshold=INGEST_MMAP_THRESHOLD,
+            normalize=normalizer.normalize_text,
+            normalize_initializer=normalizer.configure,
+            normalize_initargs=(NORMALIZER_CACHE_SIZE, NORMALIZER_DICTIONARY_PATH),
+            files=files
+        )
+    # Число абзацев - после close(): абзацы некорректных файлов исключаются при закрытии
+    paragraph_count = writer.count
+
+    manifest = dict(unchanged, **stats['files'])
+    save_manifest(target_dir, manifest, deleted, os.path.basename(previous_dir) if previous_dir else None)
+    return dict(
+        stats,
+        file_count=len(manifest),
+        total_bytes=sum(entry[0] for entry in manifest.values()),
+        paragraph_count=paragraph_count,
+        invalid_files=sum(1 for entry in manifest.values() if entry[2] is None),
+        files_added=stats['file_count'] - modified,
+        files_modified=modified,
+        files_deleted=len(deleted),
+        files_unchanged=len(unchanged)
+    )
+
+
+def run_upload(params, report):
+    model = load_model(params['model'])
+    root = resolve_corpus_path(params['corpus_path'])
+    corpus_dir = os.path.join(CORPORA_PATH, params['corpus_id'])
+    previous_dir = find_previous_corpus(CORPORA_PATH, params['corpus_path'], model.model_id,
+                                        exclude=params['corpus_id'])
+    os.makedirs(corpus_dir, exist_ok=True)
+    stats = embed_corpus(model, root, corpus_dir, scaled(report, 0, 90), previous_dir)
+
+    count = stats['paragraph_count']
+    if count:
+        store = VectorStore(corpus_dir)
+        build_ivf_index(store.vectors, corpus_dir, nlist=ANN_NLIST or None,
+                        centroids=reusable_centroids(previous_dir, count), report=scaled(report, 90, 100))
+        del store
+
+    # meta.json пишется последним: по нему корпус считается готовым к поиску
+    with open(os.path.join(corpus_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump({
+            "corpus_id": params['corpus_id'],
+            "corpus_path": params['corpus_path'],
+            "root": root,
+            "model_id": model.model_id,
+            "dimension": model.dimension,
+            "paragraph_count": count,
+            "created_at": time.time()
+        }, f, ensure_ascii=False)
+
+    return {
+        "corpus_id": params['corpus_id'],
+        "corpus_path": params['backend_corpus_path'],
+        "file_count": stats['file_count'],
+        "index_stats": {
+            "total_size_gb": round(stats['total_bytes'] / 1024 ** 3, 2),
+            "paragraph_count": stats['paragraph_count'],
+            "invalid_files": stats['invalid_files'],
+            "dimension": model.dimension
+        },
+        "reindex": {
+            "previous_corpus_id": os.path.basename(previous_dir) if previous_dir else None,
+            "files_added": stats['files_added'],
+            "files_modified": stats['files_modified'],
+            "files_deleted": stats['files_deleted'],
+            "files_unchanged": stats['files_unchanged']
+        }
+    }
+
+
+def reusable_centroids(previous_dir, count):
+    """Центроиды IVF-индекса прошлой загрузки, если корпус вырос не более чем вдвое"""
+    if not previous_dir or not os.path.exists(os.path.join(previous_dir, INDEX_META)):
+        return None
+    with open(os.path.join(previous_dir, INDEX_META)) as f:
+        if json.load(f)['count'] * 2 < count:
+            return None
+    return np.load(os.path.join(previous_dir, 'ivf_centroids.npy'))
+
+
+def run_clusterisation(params, report):
+    corpus_dir = os.path.join(CORPORA_PATH, params['corpus_id'])
+    with open(os.path.join(corpus_dir, 'meta.json'), encoding='utf-8') as f:
+        meta = json.load(f)
+    store = VectorStore(corpus_dir)
+    vectors = build_file_vectors(store, corpus_dir)
+    report(20, files_processed=len(vectors))
+
+    if len(vectors):
+        tree = build_cluster_tree(
+            os.path.join(corpus_dir, FILE_VECTORS),
+            store.files,
+            max_k=CLUSTER_MAX_K,
+            max_depth=CLUSTER_MAX_DEPTH,
+            min_size=CLUSTER_MIN_SIZE,
+            processes=CLUSTER_PROCESSES,
+            threads=CLUSTER_THREADS,
+            report=scaled(report, 20, 100),
+            sample_size=CLUSTER_SAMPLE_SIZE,
+            batch_size=CLUSTER_BATCH_SIZE,
+            iterations=CLUSTER_ITERATIONS,
+            centroids_path=centroids_path(params['job_id'])
+        )
+    else:
+        tree = {"id": "root", "name": "Все кластеры", "fileCount": 0, "avgSimilarity": 0,
+                "similarityDistribution": [0] * 5, "files": [], "children": []}
+
+    # Ссылки на визуализации те же, что у фиксированного результата
+    result = {key: value for key, value in MOCK_CLUSTER_RESULT.items() if key.endswith('_representation')}
+    result.update(folder=meta['corpus_path'], data=tree)
+    return result
+
+
+def run_classification(params, report):
+    model = load_model(params['model'])
+    # Контрольная выборка векторизуется во временный каталог задания
+    control_dir = os.path.join(JOB_RESULTS_PATH, f"{params['job_id']}.control")
+    try:
+        embed_corpus(model, resolve_corpus_path(params['corpus_path']), control_dir, scaled(report, 0, 90))
+        store = VectorStore(control_dir)
+        vectors = build_file_vectors(store, control_dir)
+        result = classify_documents(vectors, store.files, load_centroids(centroids_path(params['clustering_job_id'])),
+                                    CLASSIFICATION_TOP_K)
+        del store, vectors
+    finally:
+        shutil.rmtree(control_dir, ignore_errors=True)
+    report(100)
+
+    result.update(folder=params['corpus_path'],
+                  corpus_id=os.path.basename(params['corpus_path'].rstrip('/')),
+                  clustering_job_id=params['clustering_job_id'])
+    return result
+
+
+def run_grnti_classification(params, report):
+    model = load_model(params['model'])
+    tree = grnti.RubricTree(grnti.load_rubrics(GRNTI_RUBRICS_PATH, MOCK_GRNTI_RUBRICS))
+    rubric_matrix = grnti.rubric_vectors(
+        tree, model, GRNTI_CACHE_PATH,
+        embed=lambda names: model.embed([normalizer.normalize_text(name) for name in names], INGEST_BATCH_SIZE)
+    )
+
+    control_dir = os.path.join(JOB_RESULTS_PATH, f"{params['job_id']}.control")
+    try:
+        embed_corpus(model, resolve_corpus_path(params['corpus_path']), control_dir, scaled(report, 0, 90))
+        store = VectorStore(control_dir)
+        vectors = build_file_vectors(store, control_dir)
+        ground_truth = params.get('ground_truth') or {}
+        result = grnti.classify_documents(vectors, store.files, tree, rubric_matrix,
+                                          GRNTI_BEAM, GRNTI_MIN_SIMILARITY, GRNTI_MIN_LEVEL,
+                                          threads=GRNTI_THREADS,
+                                          expert_codes=[ground_truth.get(name) for name in store.files])
+        del store, vectors
+    finally:
+        shutil.rmtree(control_dir, ignore_errors=True)
+    report(100)
+
+    result.update(folder=params['corpus_path'], model_id=params['model_id'], grnti_branch=tree.names[tree.roots[0]])
+    return result
+
+
+def run_fine_tuning(params, report):
+    report(100)
+    return dict(
+        MOCK_FINE_TUNING_RESULT,
+        new_model_id=f"fine_tuned_{str(uuid.uuid4())[:8]}",
+        model_name=params['new_model_name'],
+        base_model_id=params['base_model_id']
+    )
@@ -0,0 +1,18 @@
+import os
+import sys
+import tempfile
+
+# Общее хранилище тестов - временный каталог; задается до импорта модулей бэкенда,
+# которые читают конфигурацию при импорте
+os.environ.setdefault('SHARED_DATA_PATH', tempfile.mkdtemp(prefix='shared_data-'))
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest  # noqa: E402
+
+
+@pytest.fixture(scope='session', autouse=True)
+def backend_services():
+    """Службы бэкенда создаются один раз на сессию, как при запуске сервера"""
+    import app
+    return app.start()
@@ -0,0 +1,40 @@
+import numpy as np
+
+from ann_index import IVFIndex, build_ivf_index
+
+
+def clustered_vectors(count, dimension, clusters, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dimension))
+    vectors = centers[rng.integers(clusters, size=count)] + 0.3 * rng.normal(size=(count, dimension))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def recall_at_k(index, vectors, queries, k, nprobe):
+    found = 0
+    for query in queries:
+        exact = np.argsort(-(vectors @ query))[:k]
+        ids, _ = index.search(query, k, nprobe)
+        found += len(set(exact) & set(ids.tolist()))
+    return found / (k * len(queries))
+
+
+def test_ivf_recall(tmp_path):
+    vectors = clustered_vectors(5000, 32, 40)
+    queries = clustered_vectors(50, 32, 40, seed=1)
+    build_ivf_index(vectors, str(tmp_path), nlist=64)
+    index = IVFIndex(str(tmp_path))
+    assert index.nlist == 64 and index.count == len(vectors)
+
+    # Просмотр всех списков - точный поиск
+    assert recall_at_k(index, vectors, queries, 10, nprobe=64) == 1.0
+    assert recall_at_k(index, vectors, queries, 10, nprobe=8) >= 0.9
+
+
+def test_ivf_scores_are_sorted_cosines(tmp_path):
+    vectors = clustered_vectors(1000, 16, 10)
+    build_ivf_index(vectors, str(tmp_path), nlist=16)
+    ids, scores = IVFIndex(str(tmp_path)).search(vectors[7], 5, nprobe=4)
+    assert ids[0] == 7
+    assert np.allclose(scores, vectors[ids] @ vectors[7], atol=1e-5)
+    assert np.all(np.diff(scores) <= 0)
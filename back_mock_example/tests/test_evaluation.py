@@ -0,0 +1,40 @@
+import numpy as np
+
+from evaluation import Evaluation, extract_predictions, score
+
+
+def test_score_counts_duplicate_predictions_once():
+    scores = score(['a', 'b', 'c'], [[['a', 0.9], ['a', 0.8], ['b', 0.1]], [['a', 0.7]], []])
+    assert scores['tp'].tolist() == [1, 0, 0]
+    assert scores['fp'].tolist() == [1, 1, 0]
+    assert scores['fn'].tolist() == [0, 1, 1]
+    assert np.allclose(scores['precision'], [0.5, 0, 0])
+    assert np.allclose(scores['recall'], [1, 0, 0])
+    assert np.allclose(scores['f1'], [2 / 3, 0, 0])
+
+
+def test_evaluation_report_and_per_class():
+    files = ['1.txt', '2.txt', '3.txt', '4.txt']
+    labels = ['a', 'a', 'b', 'b']
+    predictions = [[['a', 1]], [['b', 1]], [['b', 1], ['a', 1]], [['c', 1]]]
+    evaluation = Evaluation(files, labels, predictions, score(labels, predictions))
+
+    metrics = evaluation.report['metrics']
+    assert (metrics['total_tp'], metrics['total_fp'], metrics['total_fn']) == (2, 3, 2)
+    assert metrics['precision'] == 0.4 and metrics['recall'] == 0.5
+    assert metrics['f1'] == round(2 * 0.4 * 0.5 / 0.9, 4)
+    assert {row['label']: (row['precision'], row['recall'], row['support'])
+            for row in evaluation.report['per_class']} == {
+        'a': (0.5, 0.5, 2), 'b': (0.5, 0.5, 2), 'c': (0.0, 0.0, 0)}
+
+    page = list(evaluation.file_metrics(1, 3))
+    assert [row['file'] for row in page] == ['2.txt', '3.txt']
+    assert page[1]['precision'] == 0.5 and page[1]['recall'] == 1.0 and page[1]['match_found']
+
+
+def test_ground_truth_replaces_labels_and_skips_unlabeled():
+    result = {"files": [{"file": "a.txt", "expert_grnti_code": "10", "top_5_predictions": [["10", 1]]},
+                        {"file": "b.txt", "expert_grnti_code": None, "top_5_predictions": [["20", 1]]}]}
+    assert extract_predictions(result, 'grnti') == (['a.txt'], ['10'], [[["10", 1]]])
+    files, labels, _ = extract_predictions(result, 'grnti', {"b.txt": "20"})
+    assert (files, labels) == (['b.txt'], ['20'])
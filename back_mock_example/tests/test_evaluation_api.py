@@ -0,0 +1,72 @@
+import uuid
+
+import pytest
+
+import app as backend
+
+RESULT = {
+    "classification_results": {"summary": {}, "detailed_stats": {}},
+    "files": [
+        {"file": "a.txt", "expert_grnti_code": None, "top_5_predictions": [["10.01", 0.9], ["20.01", 0.5]]},
+        {"file": "b.txt", "expert_grnti_code": None, "top_5_predictions": [["20.01", 0.8]]},
+        {"file": "c.txt", "expert_grnti_code": None, "top_5_predictions": [["20.02", 0.7]]},
+    ]
+}
+
+GROUND_TRUTH = {"a.txt": "10.01", "b.txt": "20.01", "c.txt": "20.01"}
+
+
+@pytest.fixture
+def grnti_job():
+    job_id = str(uuid.uuid4())
+    backend.job_store.create(job_id, 'grnti_classification', {}, {})
+    backend.job_store.save_result(job_id, RESULT)
+    backend.job_store.complete(job_id)
+    return job_id
+
+
+def evaluate(client, metric, job_id, ground_truth=GROUND_TRUTH):
+    return client.post(f'/api/evaluation/{metric}', json={"ground_truth": ground_truth}, headers={
+        'x-classification-job-id': job_id,
+        'x-evaluation-type': 'grnti'
+    })
+
+
+def test_precision_and_recall_share_cached_evaluation(grnti_job):
+    client = backend.app.test_client()
+    precision = evaluate(client, 'precision', grnti_job)
+    recall = evaluate(client, 'recall', grnti_job)
+    assert precision.status_code == recall.status_code == 200
+    assert precision.headers['x-cache'] == 'miss'
+    assert recall.headers['x-cache'] == 'hit'
+
+    report = recall.get_json()
+    assert report['evaluation_type'] == 'recall'
+    assert report['metrics']['precision'] == 0.5
+    assert report['metrics']['recall'] == round(2 / 3, 4)
+    per_class = {row['label']: row for row in report['per_class']}
+    assert per_class['20.01'] == {"label": "20.01", "precision": 0.5, "recall": 0.5, "support": 2}
+    assert per_class['20.02']['support'] == 0
+    assert {'precision', 'recall'} <= set(report['file_level_metrics'][0])
+
+
+def test_other_ground_truth_is_a_cache_miss(grnti_job):
+    client = backend.app.test_client()
+    evaluate(client, 'precision', grnti_job)
+    response = evaluate(client, 'precision', grnti_job, dict(GROUND_TRUTH, **{"c.txt": "20.02"}))
+    assert response.headers['x-cache'] == 'miss'
+    assert response.get_json()['metrics']['recall'] == 1.0
+
+
+def test_job_without_labels_is_rejected(grnti_job):
+    response = evaluate(backend.app.test_client(), 'precision', grnti_job, None)
+    assert response.status_code == 400
+    assert response.get_json() == {"error": "no ground truth for this job"}
+
+
+def test_evaluation_type_must_match_job_type(grnti_job):
+    response = backend.app.test_client().post('/api/evaluation/recall', json={"ground_truth": GROUND_TRUTH}, headers={
+        'x-classification-job-id': grnti_job,
+        'x-evaluation-type': 'cluster'
+    })
+    assert response.status_code == 400
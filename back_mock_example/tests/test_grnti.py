@@ -0,0 +1,59 @@
+import numpy as np
+
+import grnti
+
+RUBRICS = [
+    {"code": "10", "name": "право"},
+    {"code": "10.01", "name": "теория права"},
+    {"code": "10.02", "name": "гражданское право"},
+    {"code": "20", "name": "информатика"},
+    {"code": "20.01", "name": "базы данных"},
+    {"code": "20.02", "name": "сети"},
+]
+
+
+def rubric_matrix(tree):
+    # Вектор рубрики - сумма базисных векторов ее и ее предков: потомки ближе к предкам, чем соседи
+    vectors = np.zeros((len(tree.codes), len(tree.codes)), dtype=np.float32)
+    for i in range(len(tree.codes)):
+        vectors[i, i] = 1
+        vectors[i, [a for a in tree.ancestors[i] if a >= 0]] = 1
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def classify(expert_codes=None):
+    tree = grnti.RubricTree(RUBRICS)
+    matrix = rubric_matrix(tree)
+    documents = matrix[[tree.index['10.02'], tree.index['20.01'], tree.index['20.02']]]
+    return tree, grnti.classify_documents(documents, ['a.txt', 'b.txt', 'c.txt'], tree, matrix,
+                                          beam=2, min_similarity=0.5, expert_codes=expert_codes)
+
+
+def test_top_predictions_exclude_ancestors_of_prediction():
+    tree, result = classify()
+    for row in result['files']:
+        codes = [code for code, _ in row['top_5_predictions']]
+        assert codes[0] == row['predicted_grnti_code']
+        ancestors = {tree.codes[a] for a in tree.ancestors[tree.index[codes[0]]] if a >= 0}
+        assert not ancestors & set(codes)
+        assert len(codes) == len(set(codes))
+
+
+def test_summary_with_expert_labels():
+    _, result = classify(['10.02', '20.01', '20.01'])
+    summary = result['classification_results']['summary']
+    assert summary['files_with_expert'] == 3
+    assert summary['agreement_with_expert'] == round(2 / 3, 4)
+    assert summary['accuracy_top_3'] == 1.0
+    assert result['files'][2]['expert_grnti_code'] == '20.01'
+    assert result['files'][2]['expert_grnti_name'] == 'базы данных'
+    stats = result['classification_results']['detailed_stats']['20.01']
+    assert (stats['true_positive'], stats['false_negative'], stats['recall']) == (1, 1, 0.5)
+
+
+def test_summary_without_expert_labels_is_null():
+    _, result = classify()
+    summary = result['classification_results']['summary']
+    assert summary['agreement_with_expert'] is None
+    assert summary['accuracy_top_3'] is None
+    assert all(row['expert_grnti_code'] is None for row in result['files'])
@@ -0,0 +1,63 @@
+import os
+
+import numpy as np
+
+from ingest import ingest_corpus
+from vector_store import VectorStore, VectorStoreWriter
+
+DIMENSION = 4
+
+
+def embed(texts):
+    return np.ones((len(texts), DIMENSION), dtype=np.float32)
+
+
+def write(path, data):
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def test_invalid_utf8_late_in_large_file_drops_whole_file(tmp_path):
+    corpus = tmp_path / 'corpus'
+    corpus.mkdir()
+    paragraphs = [f'Абзац номер {i} о загрузке корпуса.'.encode('utf-8') for i in range(200)]
+    write(corpus / 'good.txt', b'\n\n'.join(paragraphs))
+    write(corpus / 'bad.txt', b'\n\n'.join(paragraphs) + b'\n\n\xff\xfe')
+    write(corpus / 'small.txt', 'Короткий файл.'.encode('utf-8'))
+    os.symlink(corpus / 'good.txt', corpus / 'link.txt')
+
+    store_dir = str(tmp_path / 'store')
+    with VectorStoreWriter(store_dir, DIMENSION) as writer:
+        stats = ingest_corpus(str(corpus), embed, writer.append, lambda progress, **details: None,
+                              walkers=1, readers=2, normalizers=1, batch_size=8, chunk_size=512,
+                              discard=writer.discard_files)
+
+    assert stats['invalid_files'] == 1
+    assert stats['files']['bad.txt'][2] is None
+    assert 'link.txt' not in stats['files']
+
+    store = VectorStore(store_dir)
+    assert sorted(store.files) == ['good.txt', 'small.txt']
+    assert store.count == len(paragraphs) + 1
+    assert len(store.vectors) == store.count
+    counts = np.bincount(np.asarray(store.paragraphs['file']), minlength=2)
+    assert counts[store.files.index('good.txt')] == len(paragraphs)
+
+
+def test_writer_discard_compacts_store(tmp_path):
+    store_dir = str(tmp_path / 'store')
+    with VectorStoreWriter(store_dir, DIMENSION) as writer:
+        for block in range(3):
+            records = [(f'{name}.txt', block * 10 + i, 5) for i in range(4) for name in 'abc']
+            vectors = np.arange(len(records) * DIMENSION, dtype=np.float32).reshape(-1, DIMENSION) + block * 100
+            writer.append(records, vectors)
+        writer.discard_files({'b.txt', 'missing.txt'})
+
+    store = VectorStore(store_dir)
+    assert store.files == ['a.txt', 'c.txt']
+    assert store.count == 24
+    names = [store.files[i] for i in store.paragraphs['file']]
+    assert names.count('a.txt') == names.count('c.txt') == 12
+    # Вектор каждой записи остается при ней: первая компонента кодирует блок и позицию
+    assert np.array_equal(np.asarray(store.vectors[:2, 0]), [0, 2 * DIMENSION])
+    assert np.array_equal(np.asarray(store.paragraphs['offset'][:2]), [0, 0])
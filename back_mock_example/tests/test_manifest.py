@@ -0,0 +1,52 @@
+import os
+
+from manifest import diff_files, file_digest, scan_files
+
+
+def write(path, text, mtime_ns=None):
+    path.write_text(text, encoding='utf-8')
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def manifest_entry(path):
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns, file_digest(path)]
+
+
+def test_diff_files(tmp_path):
+    (tmp_path / 'sub').mkdir()
+    files = {name: tmp_path / name for name in ('same.txt', 'touched.txt', 'edited.txt', 'grown.txt',
+                                                'gone.txt', os.path.join('sub', 'new.txt'))}
+    for name in ('same.txt', 'touched.txt', 'edited.txt', 'grown.txt', 'gone.txt'):
+        write(files[name], f'текст {name}', mtime_ns=1_000_000_000)
+    previous = {name: manifest_entry(files[name])
+                for name in ('same.txt', 'touched.txt', 'edited.txt', 'grown.txt', 'gone.txt')}
+
+    os.utime(files['touched.txt'], ns=(2_000_000_000, 2_000_000_000))
+    write(files['edited.txt'], 'ТЕКСТ edited.txt', mtime_ns=2_000_000_000)
+    write(files['grown.txt'], 'текст grown.txt и еще', mtime_ns=1_000_000_000)
+    files['gone.txt'].unlink()
+    write(files[os.path.join('sub', 'new.txt')], 'новый')
+    (tmp_path / 'notes.md').write_text('не корпус')
+
+    current = scan_files(str(tmp_path))
+    assert sorted(current) == sorted(['same.txt', 'touched.txt', 'edited.txt', 'grown.txt',
+                                      os.path.join('sub', 'new.txt')])
+
+    changed, unchanged, deleted, modified = diff_files(previous, current)
+    assert sorted(os.path.relpath(item[0], tmp_path) for item in changed) == sorted(
+        ['edited.txt', 'grown.txt', os.path.join('sub', 'new.txt')])
+    assert sorted(unchanged) == ['same.txt', 'touched.txt']
+    # Файл с новым mtime и прежним содержимым получает новый mtime в манифесте
+    assert unchanged['touched.txt'][1] == 2_000_000_000
+    assert deleted == ['gone.txt']
+    assert modified == 2
+
+
+def test_invalid_file_is_rehashed_never(tmp_path):
+    write(tmp_path / 'bad.txt', 'x', mtime_ns=1_000_000_000)
+    previous = {'bad.txt': [1, 1_000_000_000, None]}
+    os.utime(tmp_path / 'bad.txt', ns=(2_000_000_000, 2_000_000_000))
+    changed, unchanged, _, modified = diff_files(previous, scan_files(str(tmp_path)))
+    assert len(changed) == 1 and not unchanged and modified == 1
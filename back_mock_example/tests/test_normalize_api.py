@@ -0,0 +1,40 @@
+import io
+
+import pytest
+
+import app as backend
+import normalizer
+from config import TEXT_MAX_BYTES
+
+
+@pytest.fixture
+def client():
+    return backend.app.test_client()
+
+
+def post_chunked(client, body):
+    """POST /api/normalize с телом без Content-Length (Transfer-Encoding: chunked)"""
+    return client.post('/api/normalize', input_stream=io.BytesIO(body),
+                       headers={'Content-Type': 'text/plain; charset=utf-8', 'Transfer-Encoding': 'chunked'},
+                       environ_overrides={'wsgi.input_terminated': True})
+
+
+def test_chunked_body_is_normalized(client):
+    text = 'Военные   искусства и так-\nтика. ' * 20000
+    response = post_chunked(client, text.encode('utf-8'))
+    assert response.status_code == 200
+    assert response.get_data(as_text=True) == normalizer.normalize_text(text)
+
+
+def test_chunked_body_over_limit_is_rejected_before_streaming(client):
+    body = b'word ' * (TEXT_MAX_BYTES // 5 + 1)
+    assert len(body) > TEXT_MAX_BYTES
+    response = post_chunked(client, body)
+    assert response.status_code == 413
+    assert response.get_json() == {"error": "PAYLOAD_TOO_LARGE"}
+
+
+def test_content_length_over_limit_is_rejected(client):
+    response = client.post('/api/normalize', data=b'a' * (TEXT_MAX_BYTES + 1),
+                           headers={'Content-Type': 'text/plain'})
+    assert response.status_code == 413
@@ -0,0 +1,38 @@
+import pytest
+
+import normalizer
+
+TEXT = ('Слова с пере-\nносом строки, «кавычки» и ёлки.\n\n'
+        'Второй абзац: мягкий\xadперенос и двойной пере-\r\n  нос в конце')
+
+
+def test_decode_chunks_joins_characters_split_between_chunks():
+    data = TEXT.encode('utf-8')
+    chunks = [data[i:i + 1] for i in range(len(data))]
+    assert ''.join(normalizer.decode_chunks(chunks)) == TEXT
+
+
+def test_decode_chunks_replaces_invalid_bytes():
+    assert ''.join(normalizer.decode_chunks([b'ok \xff', b'\xd0'])) == 'ok ��'
+
+
+def test_hyphen_break_is_repaired():
+    assert normalizer.normalize_text('пере-\nнос') == normalizer.normalize_text('перенос')
+    # Дефис перед заглавной буквой - не перенос
+    assert normalizer.normalize_text('Северо-\nЗапад') != normalizer.normalize_text('СевероЗапад')
+
+
+@pytest.mark.parametrize('size', [1, 2, 3, 7, 16])
+def test_result_does_not_depend_on_chunk_boundaries(size):
+    expected = normalizer.normalize_text(TEXT)
+    chunks = [TEXT[i:i + size] for i in range(0, len(TEXT), size)]
+    assert ''.join(normalizer.iter_normalized(chunks)) == expected
+    assert normalizer.normalize_text(TEXT, chunk_size=size) == expected
+
+
+def test_every_split_point_of_a_hyphen_break():
+    text = 'начало пере-\r\n  нос конец'
+    expected = normalizer.normalize_text(text)
+    for cut in range(1, len(text)):
+        stream = normalizer.StreamNormalizer()
+        assert stream.feed(text[:cut]) + stream.feed(text[cut:]) + stream.finish() == expected, cut
@@ -0,0 +1,158 @@
+"""
+Хранилище векторов корпуса на диске
+Эмбеддинги лежат сплошной матрицей (float32 или float16), метаданные абзацев -
+массивом записей (номер файла, байтовое смещение, длина) рядом с ней. Оба файла
+открываются через mmap, поэтому открытие корпуса не зависит от его размера,
+а процессы поиска и кластеризации делят страницы через кэш ОС
+"""
+import json
+import os
+
+import numpy as np
+
+STORE_META = 'store.json'
+VECTORS_FILE = 'vectors.bin'
+PARAGRAPHS_FILE = 'paragraphs.bin'
+FILES_FILE = 'files.json'
+
+PARAGRAPH_DTYPE = np.dtype([('file', '<i4'), ('offset', '<i8'), ('length', '<i4')])
+
+DTYPES = {'float32': '<f4', 'float16': '<f2'}
+
+
+class VectorStoreWriter:
+    """Дописывает пакеты векторов и записи абзацев; метаданные фиксируются в close()"""
+
+    def __init__(self, path, dimension, dtype='float32'):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.dimension = dimension
+        self.dtype = dtype
+        self.count = 0
+        self._files = []
+        self._file_ids = {}
+        self._discarded = set()
+        self._vectors = open(os.path.join(path, VECTORS_FILE), 'wb')
+        self._paragraphs = open(os.path.join(path, PARAGRAPHS_FILE), 'wb')
+
+    def append(self, records, vectors):
+        """records - список (file_id, смещение, длина), vectors - матрица (len(records), dimension)"""
+        rows = np.empty(len(records), dtype=PARAGRAPH_DTYPE)
+        for i, (file_id, offset, length) in enumerate(records):
+            file_no = self._file_ids.get(file_id)
+            if file_no is None:
+                file_no = self._file_ids[file_id] = len(self._files)
+                self._files.append(file_id)
+            rows[i] = (file_no, offset, length)
+        self._vectors.write(np.ascontiguousarray(vectors, dtype=DTYPES[self.dtype]).tobytes())
+        self._paragraphs.write(rows.tobytes())
+        self.count += len(records)
+
+    def copy_files(self, store, file_ids, block_size=65536):
+        """Переносит векторы и записи абзацев файлов file_ids из другого хранилища блоками, без модели"""
+        mapping = np.full(max(len(store.files), 1), -1, dtype=np.int32)
+        for file_no, file_id in enumerate(store.files):
+            if file_id in file_ids:
+                new_no = self._file_ids.get(file_id)
+                if new_no is None:
+                    new_no = self._file_ids[file_id] = len(self._files)
+                    self._files.append(file_id)
+                mapping[file_no] = new_no
+
+        for start in range(0, store.count, block_size):
+            rows = np.array(store.paragraphs[start:start + block_size])
+            keep = mapping[rows['file']] >= 0
+            if not keep.any():
+                continue
+            rows = rows[keep]
+            rows['file'] = mapping[rows['file']]
+            vectors = np.asarray(store.vectors[start:start + block_size])[keep]
+            self._vectors.write(np.ascontiguousarray(vectors, dtype=DTYPES[self.dtype]).tobytes())
+            self._paragraphs.write(rows.tobytes())
+            self.count += len(rows)
+
+    def discard_files(self, file_ids):
+        """Исключает уже записанные абзацы файлов file_ids; хранилище уплотняется в close()"""
+        self._discarded.update(file_id for file_id in file_ids if file_id in self._file_ids)
+
+    def _compact(self, block_size=65536):
+        """Переписывает векторы и записи абзацев без исключенных файлов на месте, блоками"""
+        files = [file_id for file_id in self._files if file_id not in self._discarded]
+        mapping = np.full(len(self._files), -1, dtype=np.int32)
+        for file_no, file_id in enumerate(files):
+            mapping[self._file_ids[file_id]] = file_no
+        dtype = np.dtype(DTYPES[self.dtype])
+        vector_bytes = self.dimension * dtype.itemsize
+        row_bytes = PARAGRAPH_DTYPE.itemsize
+
+        count = 0
+        with open(os.path.join(self.path, VECTORS_FILE), 'r+b') as vectors_file, \
+                open(os.path.join(self.path, PARAGRAPHS_FILE), 'r+b') as paragraphs_file:
+            for start in range(0, self.count, block_size):
+                size = min(block_size, self.count - start)
+                paragraphs_file.seek(start * row_bytes)
+                rows = np.frombuffer(paragraphs_file.read(size * row_bytes), dtype=PARAGRAPH_DTYPE).copy()
+                vectors_file.seek(start * vector_bytes)
+                vectors = np.frombuffer(vectors_file.read(size * vector_bytes), dtype=dtype)
+                keep = mapping[rows['file']] >= 0
+                rows = rows[keep]
+                rows['file'] = mapping[rows['file']]
+                # Запись идет не дальше уже прочитанного: позиция count не больше start
+                paragraphs_file.seek(count * row_bytes)
+                paragraphs_file.write(rows.tobytes())
+                vectors_file.seek(count * vector_bytes)
+                vectors_file.write(vectors.reshape(size, self.dimension)[keep].tobytes())
+                count += len(rows)
+            paragraphs_file.truncate(count * row_bytes)
+            vectors_file.truncate(count * vector_bytes)
+
+        self._files = files
+        self._file_ids = {file_id: file_no for file_no, file_id in enumerate(files)}
+        self._discarded = set()
+        self.count = count
+
+    def close(self):
+        self._vectors.close()
+        self._paragraphs.close()
+        if self._discarded:
+            self._compact()
+        with open(os.path.join(self.path, FILES_FILE), 'w', encoding='utf-8') as f:
+            json.dump(self._files, f, ensure_ascii=False)
+        with open(os.path.join(self.path, STORE_META), 'w') as f:
+            json.dump({"count": self.count, "dimension": self.dimension, "dtype": self.dtype}, f)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class VectorStore:
+    """Открытое только на чтение хранилище векторов корпуса"""
+
+    def __init__(self, path):
+        with open(os.path.join(path, STORE_META)) as f:
+            meta = json.load(f)
+        self.count = meta['count']
+        self.dimension = meta['dimension']
+        self.dtype = meta['dtype']
+        with open(os.path.join(path, FILES_FILE), encoding='utf-8') as f:
+            self.files = json.load(f)
+
+        if self.count:
+            self.vectors = np.memmap(os.path.join(path, VECTORS_FILE), dtype=DTYPES[self.dtype], mode='r',
+                                     shape=(self.count, self.dimension))
+            self.paragraphs = np.memmap(os.path.join(path, PARAGRAPHS_FILE), dtype=PARAGRAPH_DTYPE, mode='r',
+                                        shape=(self.count,))
+        else:
+            self.vectors = np.empty((0, self.dimension), dtype=DTYPES[self.dtype])
+            self.paragraphs = np.empty(0, dtype=PARAGRAPH_DTYPE)
+
+    def __len__(self):
+        return self.count
+
+    def record(self, paragraph_id):
+        """(file_id, смещение, длина) абзаца"""
+        row = self.paragraphs[paragraph_id]
+        return self.files[row['file']], int(row['offset']), int(row['length'])
@@ -211,13 +211,15 @@ function displayResults(results) {
 
     // Общая статистика
     const summary = results.classification_results.summary;
+    // Показатели по экспертной разметке равны null, если разметка не передавалась
+    const percent = value => value === null || value === undefined ? '—' : `${(value * 100).toFixed(1)}%`;
     document.getElementById('summaryStats').innerHTML = `
         <div class="stat-item">
-            <div class="stat-value">${(summary.agreement_with_expert * 100).toFixed(1)}%</div>
+            <div class="stat-value">${percent(summary.agreement_with_expert)}</div>
             <div class="stat-label">Совпадение с экспертом</div>
         </div>
         <div class="stat-item">
-            <div class="stat-value">${(summary.accuracy_top_3 * 100).toFixed(1)}%</div>
+            <div class="stat-value">${percent(summary.accuracy_top_3)}</div>
             <div class="stat-label">Точность (топ-3)</div>
         </div>
         <div class="stat-item">
@@ -77,6 +77,18 @@ async function evaluatePrecision() {
         return;
     }
 
+    // Экспертная разметка передается в теле запроса; без нее используются метки из результата
+    const groundTruthText = document.getElementById('groundTruth').value.trim();
+    let body = {};
+    if (groundTruthText) {
+        try {
+            body = { ground_truth: JSON.parse(groundTruthText) };
+        } catch (error) {
+            showStatus('❌ Разметка должна быть JSON-объектом: файл → метка', 'error');
+            return;
+        }
+    }
+
     try {
         document.getElementById('evaluateBtn').disabled = true;
         showStatus('🧮 Вычисление точности...', 'processing');
@@ -87,7 +99,8 @@ async function evaluatePrecision() {
                 'Content-Type': 'application/json',
                 'x-classification-job-id': jobId,
                 'x-evaluation-type': evalType
-            }
+            },
+            body: JSON.stringify(body)
         });
 
         if (!response.ok) {
@@ -496,7 +496,15 @@ app.post('/api/classification/grnti', upload.array('files'), async (req, res) =>
       return res.status(400).json({ error: 'x-clustering-job-id header is required' });
     }
 
-    const response = await axios.post(`${getBackendURL(req)}/classification/grnti`, {}, {
+    // Экспертные рубрики приходят полем формы ground_truth (JSON: файл -> код ГРНТИ)
+    let groundTruth;
+    try {
+      groundTruth = req.body?.ground_truth ? JSON.parse(req.body.ground_truth) : undefined;
+    } catch (parseError) {
+      return res.status(400).json({ error: 'ground_truth must be JSON' });
+    }
+
+    const response = await axios.post(`${getBackendURL(req)}/classification/grnti`, groundTruth ? { ground_truth: groundTruth } : {}, {
       headers: {
         'x-corpus-path': corpusPath,
         'x-model-id': modelId,
@@ -578,10 +586,13 @@ app.post('/api/evaluation/precision', async (req, res) => {
       return res.status(400).json({ error: 'Missing required headers' });
     }
     
-    const response = await axios.post(`${getBackendURL(req)}/evaluation/precision`, {}, {
+    // Тело запроса содержит экспертную разметку ground_truth, ее нужно передать бэкенду
+    const response = await axios.post(`${getBackendURL(req)}/evaluation/precision`, req.body || {}, {
+      params: req.query,
       headers: {
         'x-classification-job-id': jobId,
         'x-evaluation-type': evalType,
+        ...(req.headers['x-threshold'] && { 'x-threshold': req.headers['x-threshold'] }),
         'Content-Type': 'application/json'
       }
     });
@@ -595,6 +606,11 @@ app.post('/api/evaluation/precision', async (req, res) => {
       return res.status(404).json({ error: 'Classification job not found' });
     }
     
+    // Ошибки запроса (нет разметки, тип оценки не совпадает с типом задания) - как есть
+    if (error.response?.status === 400) {
+      return res.status(400).json(error.response.data);
+    }
+    
     res.status(500).json({ error: 'Internal server error' });
   }
 });
@@ -607,10 +623,13 @@ app.post('/api/evaluation/recall', async (req, res) => {
       return res.status(400).json({ error: 'Missing required headers' });
     }
     
-    const response = await axios.post(`${getBackendURL(req)}/evaluation/recall`, {}, {
+    // Тело запроса содержит экспертную разметку ground_truth, ее нужно передать бэкенду
+    const response = await axios.post(`${getBackendURL(req)}/evaluation/recall`, req.body || {}, {
+      params: req.query,
       headers: {
         'x-classification-job-id': jobId,
         'x-evaluation-type': evalType,
+        ...(req.headers['x-threshold'] && { 'x-threshold': req.headers['x-threshold'] }),
         'Content-Type': 'application/json'
       }
     });
@@ -624,6 +643,11 @@ app.post('/api/evaluation/recall', async (req, res) => {
       return res.status(404).json({ error: 'Classification job not found' });
     }
     
+    // Ошибки запроса (нет разметки, тип оценки не совпадает с типом задания) - как есть
+    if (error.response?.status === 400) {
+      return res.status(400).json(error.response.data);
+    }
+    
     res.status(500).json({ error: 'Internal server error' });
   }
 });